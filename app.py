@@ -2,20 +2,47 @@ import dash
 from dash import dcc, html
 import dash_bootstrap_components as dbc
 from dash.dependencies import Input, Output, State
+import importlib
 import os
+from flask import jsonify
 
-# Importing page modules
-from pages import home, caller_reports, group_reports, district_reports, source_reports, course_reports
+from utils.dataset_cache import registry
+from utils.figure_cache import figure_cache
+from utils.metrics import instrument
+from utils.serialization import install_json_encoder
+
+# Route -> page module. Each page builds its layout per request through `layout()`;
+# heavy libraries (plotly.express, ReportLab, Kaleido) are imported by the
+# functions that draw or export charts, so none of them load at startup.
+PAGES = {
+    '/': 'pages.home',
+    '/caller-reports': 'pages.caller_reports',
+    '/group-reports': 'pages.group_reports',
+    '/district-reports': 'pages.district_reports',
+    '/source-reports': 'pages.source_reports',
+    '/course-reports': 'pages.course_reports',
+}
 
 # Initialize Dash app with DARKLY theme
 app = dash.Dash(__name__, suppress_callback_exceptions=True, external_stylesheets=[dbc.themes.DARKLY])
 server = app.server
 
-home.register_callbacks(app)
-caller_reports.register_callbacks(app)
-group_reports.register_callbacks(app)
-district_reports.register_callbacks(app)
-source_reports.register_callbacks(app)
+# Time every callback registered below and expose the histograms at /metrics
+instrument(app)
+
+# Encode responses with orjson instead of Plotly's encoder
+install_json_encoder()
+
+# Dash needs every callback before the first request, so pages are registered here
+for module_name in PAGES.values():
+    page = importlib.import_module(module_name)
+    if hasattr(page, 'register_callbacks'):
+        page.register_callbacks(app)
+
+# Hit/miss counters and sizes of the server-side caches
+@server.route("/cache-stats")
+def cache_stats():
+    return jsonify({"datasets": registry.stats(), "figures": figure_cache.stats()})
 
 # Sidebar Navigation (Collapsible for Mobile)
 sidebar_content = dbc.Nav(
@@ -47,7 +74,7 @@ toggle_button = dbc.Button("☰ Menu", id="toggle-sidebar", n_clicks=0, color="p
 # Layout
 app.layout = dbc.Container([
     dcc.Location(id='url', refresh=False),
-    dcc.Store(id='processed-data-store'),
+    dcc.Store(id='processed-data-store'),  # Holds the dataset-cache token, not the data
 
     # Sidebar Toggle Button (only visible on mobile)
     dbc.Row([dbc.Col(toggle_button, width="auto")], className="mb-2"),
@@ -69,18 +96,8 @@ app.layout = dbc.Container([
     Input('url', 'pathname')
 )
 def display_page(pathname):
-    if pathname == '/caller-reports':
-        return caller_reports.layout
-    elif pathname == '/group-reports':
-        return group_reports.layout
-    elif pathname == '/district-reports':
-        return district_reports.layout
-    elif pathname == '/source-reports':
-        return source_reports.layout
-    elif pathname == '/course-reports':
-        return course_reports.layout
-    else:
-        return home.layout
+    page = importlib.import_module(PAGES.get(pathname, PAGES['/']))
+    return page.layout()
 
 # Callback to toggle sidebar on mobile
 @app.callback(
@@ -0,0 +1,43 @@
+""" Microbenchmark: per-row vs batched `Call Duration` parsing.
+
+Run from the repository root:  python -m benchmarks.bench_duration_parsing [rows]
+"""
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from utils.data_processing import convert_duration_to_seconds, convert_durations_to_seconds
+
+
+def make_durations(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    hours = rng.integers(0, 2, rows)
+    minutes = rng.integers(0, 30, rows)
+    seconds = rng.integers(0, 60, rows)
+    durations = pd.Series(
+        [f"{h}h:{s}s" if h and m % 5 == 0 else f"{h}h:{m}m:{s}s" for h, m, s in zip(hours, minutes, seconds)],
+        dtype=object,
+    )
+    durations[rng.random(rows) < 0.05] = np.nan
+    return durations
+
+
+def per_row(durations):
+    return durations.apply(lambda x: convert_duration_to_seconds(str(x)) if pd.notna(x) else np.nan)
+
+
+def main(rows=500_000, repeat=3):
+    durations = make_durations(rows)
+    assert per_row(durations).equals(convert_durations_to_seconds(durations))
+
+    old = min(timeit.repeat(lambda: per_row(durations), number=1, repeat=repeat))
+    new = min(timeit.repeat(lambda: convert_durations_to_seconds(durations), number=1, repeat=repeat))
+    print(f"rows={rows:,}")
+    print(f"  per-row apply : {old * 1000:9.1f} ms")
+    print(f"  batched       : {new * 1000:9.1f} ms  ({old / new:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
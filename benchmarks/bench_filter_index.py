@@ -0,0 +1,64 @@
+""" Benchmark: chained `isin` copies vs the bitmap filter index as filters are added.
+
+Run from the repository root:  python -m benchmarks.bench_filter_index [rows]
+"""
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from utils.data_processing import compact_dtypes
+from utils.filter_index import FilterIndex
+
+# (column, number of distinct values, number selected in the filter)
+FILTERS = [
+    ("Owner", 60, 10),
+    ("Lead Source", 12, 6),
+    ("Lead | Course", 15, 8),
+    ("Lead | Permanent District", 10, 6),
+    ("ActivityEvent", 3, 2),
+    ("Lead Stage", 8, 5),
+    ("Group", 5, 4),
+]
+
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        col: rng.choice([f"{col} {i}" for i in range(cardinality)], rows)
+        for col, cardinality, _ in FILTERS
+    })
+    df["Call Duration Seconds"] = rng.integers(0, 900, rows)
+    return compact_dtypes(df)
+
+
+def chained_isin(df, filters):
+    for col, values in filters.items():
+        df = df[df[col].isin(values)]
+    return df
+
+
+def indexed(df, index, filters):
+    rows = index.rows(filters)
+    return df if rows is None else df.take(rows)
+
+
+def main(rows=300_000, repeat=5):
+    df = make_frame(rows)
+    build = min(timeit.repeat(lambda: FilterIndex(df), number=1, repeat=3))
+    index = FilterIndex(df)
+    print(f"rows={rows:,}  index build {build * 1000:.1f} ms, {index.nbytes / 1024:.0f} KB")
+    print(f"{'filters':>7} {'isin chain':>12} {'bitmap index':>13} {'rows':>9}")
+
+    for active in range(len(FILTERS) + 1):
+        filters = {col: [f"{col} {i}" for i in range(selected)] for col, _, selected in FILTERS[:active]}
+        assert chained_isin(df, filters).index.equals(indexed(df, index, filters).index)
+        old = min(timeit.repeat(lambda: chained_isin(df, filters), number=1, repeat=repeat))
+        new = min(timeit.repeat(lambda: indexed(df, index, filters), number=1, repeat=repeat))
+        matched = len(indexed(df, index, filters))
+        print(f"{active:>7} {old * 1000:>10.2f}ms {new * 1000:>11.2f}ms {matched:>9,}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 300_000)
@@ -0,0 +1,125 @@
+""" Benchmark: frame serializers and response encoders on a synthetic call log.
+
+Frames: the processed dataset as JSON-safe text for a dcc.Store, through
+each of FRAME_CODECS (pandas JSON split, the old store format, against
+base64 Arrow IPC and Feather), as encode / decode time, payload size, and
+whether the dtypes survive. The store now carries only a dataset token, so
+these are kept here for comparison.
+
+Responses: a report page's callback output (six serialized charts in a
+Div) and a 100k-point scatter figure, encoded with Plotly's JSON and orjson engines
+and with `utils.serialization.to_json`.
+
+Run from the repository root:  python -m benchmarks.bench_serialization [rows]
+"""
+import base64
+import io
+import json
+import sys
+import timeit
+
+import pandas as pd
+import plotly.express as px
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.ipc as ipc
+import plotly.io.json as pio_json
+from dash import dcc, html
+
+import config
+from benchmarks.synthetic import SIZES, make_call_log
+from utils.data_processing import process_data
+from utils.serialization import to_json
+
+
+def json_encode(df):
+    return df.to_json(date_format="iso", orient="split")
+
+
+def json_decode(data):
+    return pd.read_json(io.StringIO(data), orient="split")
+
+
+def arrow_encode(df):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return base64.b64encode(sink.getvalue()).decode("ascii")
+
+
+def arrow_decode(data):
+    return ipc.open_stream(pa.py_buffer(base64.b64decode(data))).read_all().to_pandas()
+
+
+def feather_encode(df):
+    sink = pa.BufferOutputStream()
+    feather.write_feather(df.reset_index(drop=True), sink, compression="lz4")
+    return base64.b64encode(sink.getvalue()).decode("ascii")
+
+
+def feather_decode(data):
+    return feather.read_feather(pa.BufferReader(base64.b64decode(data)))
+
+
+# Frame -> JSON-safe text codecs, as (encode, decode)
+FRAME_CODECS = {
+    "json": (json_encode, json_decode),
+    "arrow": (arrow_encode, arrow_decode),
+    "feather": (feather_encode, feather_decode),
+}
+
+
+def best(fn, repeat):
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+
+def report_page(df):
+    """ Callback output shaped like the Group Reports page """
+    counts = df.groupby(["Group", "Owner", "Lead Stage"], observed=True).size().reset_index(name="Lead Count")
+    figures = [
+        px.sunburst(counts, path=["Group", "Owner", "Lead Stage"], values="Lead Count", template="plotly_dark"),
+        px.scatter(counts, x="Group", y="Owner", size="Lead Count", color="Lead Stage", template="plotly_dark"),
+        px.funnel(counts, x="Lead Count", y="Lead Stage", color="Group", template="plotly_dark"),
+        px.bar(counts, x="Lead Count", y="Owner", color="Group", orientation="h", template="plotly_dark"),
+        px.pie(counts, values="Lead Count", names="Group", hole=0.4, template="plotly_dark"),
+        px.treemap(counts, path=["Group", "Owner"], values="Lead Count", template="plotly_dark"),
+    ]
+    # Serialized on the figure pool and cached as dicts, as the report pages do
+    graphs = [dcc.Graph(figure=fig.to_plotly_json()) for fig in figures]
+    return {"multi": True, "response": {"group-reports-content": {"children": html.Div(graphs)}}}
+
+
+def main(rows=SIZES["100k"], repeat=5):
+    df = process_data(make_call_log(rows), compact=config.COMPACT_DTYPES)
+    print(f"rows={rows:,}  in memory {df.memory_usage(deep=True).sum() / 1e6:.1f} MB")
+
+    print(f"\n{'frame':<8} {'encode':>10} {'decode':>10} {'payload':>10}  dtypes kept")
+    for name, (encode, decode) in FRAME_CODECS.items():
+        payload = encode(df)
+        encode_time = best(lambda: encode(df), repeat)
+        decode_time = best(lambda: decode(payload), repeat)
+        kept = (decode(payload).dtypes == df.dtypes).all()
+        print(f"{name:<8} {encode_time * 1000:>8.1f}ms {decode_time * 1000:>8.1f}ms {len(payload) / 1e6:>8.1f}MB  {kept}")
+
+    responses = {
+        "report page": report_page(df),
+        "scatter 100k": px.scatter(df, x="CreatedOn", y="Call Duration Seconds", color="Status", render_mode="webgl"),
+    }
+    encoders = {
+        "plotly json": lambda value: pio_json.to_json_plotly(value, engine="json"),
+        "plotly orjson": lambda value: pio_json.to_json_plotly(value, engine="orjson"),
+        "to_json": to_json,
+    }
+    print(f"\n{'response':<14} {'size':>8} " + " ".join(f"{name:>14}" for name in encoders))
+    for label, value in responses.items():
+        # Same JSON, except orjson writes datetimes without a zero nanosecond fraction
+        expected = encoders["plotly json"](value).replace(".000000000", "")
+        assert json.loads(to_json(value)) == json.loads(expected)
+        times = [best(lambda: encode(value), repeat) for encode in encoders.values()]
+        size = len(encoders["plotly json"](value))
+        print(f"{label:<14} {size / 1e6:>6.2f}MB " + " ".join(f"{t * 1000:>12.1f}ms" for t in times))
+
+
+if __name__ == "__main__":
+    main(SIZES.get(sys.argv[1].lower()) or int(sys.argv[1]) if len(sys.argv) > 1 else SIZES["100k"])
@@ -0,0 +1,60 @@
+""" Benchmark: cold start of `app` (what each gunicorn worker pays at boot).
+
+Imports `app` in fresh interpreters with `python -X importtime` and reports
+the median wall time, the slowest top-level imports, and whether any of the
+libraries meant to load lazily were pulled in at startup.
+
+Run from the repository root:  python -m benchmarks.bench_startup [runs]
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only needed once a chart is drawn or exported; should not appear at startup
+DEFERRED = ["plotly.express", "reportlab", "kaleido"]
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_app():
+    """ (wall seconds, [(module, self us, cumulative us, depth)]) for one cold import """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    wall = time.perf_counter() - start
+    modules = []
+    for match in LINE.finditer(result.stderr):
+        self_us, cumulative_us, indent, name = match.groups()
+        modules.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return wall, modules
+
+
+def main(runs=5, top=12):
+    walls, imports = [], []
+    for _ in range(runs):
+        wall, modules = import_app()
+        walls.append(wall)
+        imports.append(next(cumulative for name, _, cumulative, depth in modules if name == "app" and depth == 0))
+
+    print(f"runs={runs}  wall (interpreter + import app) median {statistics.median(walls) * 1000:.0f} ms, "
+          f"import app median {statistics.median(imports) / 1000:.0f} ms")
+
+    # Breakdown from the last run: modules imported directly by app or by the pages/utils it loads
+    first_level = sorted((m for m in modules if m[3] <= 1), key=lambda m: m[2], reverse=True)
+    print(f"{'module':<40} {'cumulative':>11}")
+    for name, _, cumulative, _ in first_level[:top]:
+        print(f"{name:<40} {cumulative / 1000:>9.1f}ms")
+
+    loaded = sorted({name for name, *_ in modules for prefix in DEFERRED if name == prefix or name.startswith(prefix + ".")})
+    print("deferred libraries loaded at startup:", ", ".join(loaded) if loaded else "none")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,91 @@
+""" Fixtures for the pytest-benchmark suite: synthetic call logs, the Dash app and an uploaded dataset.
+
+Every benchmark taking `size` runs once per size given with --sizes (see
+benchmarks.synthetic). Snapshots are written to temporary directories.
+
+Run from the repository root:
+    python -m pytest benchmarks [--sizes 10k,100k,1m] [--rounds 3] [-k "not pdf"] --benchmark-group-by=param:size
+Add --benchmark-autosave (or --benchmark-save=NAME) to keep the results, and
+--benchmark-compare (or --benchmark-compare=NNNN) to compare with a saved run.
+"""
+import base64
+import tempfile
+
+import pytest
+
+import config
+from benchmarks.synthetic import SIZES, make_call_log
+
+
+def pytest_addoption(parser):
+    parser.addoption("--sizes", default="10k,100k,1m", help=f"comma-separated call log sizes, from {', '.join(SIZES)}")
+    parser.addoption("--rounds", type=int, default=3, help="rounds of the benchmarks that need a fresh state per call")
+
+
+def pytest_generate_tests(metafunc):
+    if "size" in metafunc.fixturenames:
+        sizes = metafunc.config.getoption("sizes").lower().split(",")
+        metafunc.parametrize("size", sizes, scope="session")
+
+
+def use_temporary_dirs():
+    """ Point the snapshot directories at new temporary ones, so the next upload starts fresh """
+    config.DATA_DIR = tempfile.mkdtemp(prefix="bench-data-")
+    config.SHARED_DIR = tempfile.mkdtemp(prefix="bench-shared-") if config.SHARED_DIR else ""
+
+
+def callback(app, output):
+    """ (undecorated body, number of arguments) of the callback writing `output` """
+    spec = next(spec for key, spec in app.callback_map.items() if output in key.strip(".").split("..."))
+    func = spec["callback"]
+    return getattr(func, "__wrapped__", func), len(spec["inputs"]) + len(spec.get("state", []))
+
+
+@pytest.fixture(scope="session")
+def rounds(pytestconfig):
+    return pytestconfig.getoption("rounds")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def data_dirs():
+    # Keep snapshots out of the real data directories
+    use_temporary_dirs()
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import app
+    return app
+
+
+@pytest.fixture(scope="session")
+def call_log(size):
+    return make_call_log(SIZES[size])
+
+
+@pytest.fixture(scope="session")
+def upload(size, call_log):
+    """ (contents, filename) of the call log as a base64 CSV upload """
+    csv = call_log.to_csv(index=False).encode()
+    return "data:text/csv;base64," + base64.b64encode(csv).decode(), f"calls_{size}.csv"
+
+
+@pytest.fixture(scope="session")
+def token(app, upload):
+    """ Dataset token of the call log, uploaded through the Home page callback """
+    contents, filename = upload
+    update_output, _ = callback(app, "output-data-upload.children")
+    token = update_output([contents], [filename], "replace", None)[-1]
+    if token is None:
+        raise RuntimeError("upload callback did not return a dataset token")
+    return token
+
+
+@pytest.fixture(scope="session")
+def render_pool(app):
+    """ Every render process (and its kaleido) started before anything is timed """
+    import plotly.graph_objects as go
+    from utils.jobs import Job
+    from utils.pdf_export import render_figures
+
+    render_figures(Job(), [go.Figure()] * (2 * config.EXPORT_RENDER_PROCESSES))
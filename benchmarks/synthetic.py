@@ -0,0 +1,132 @@
+""" Synthetic call logs shaped like the CRM export the Home page accepts.
+
+Rows carry the documented columns (ActivityEvent, Owner, Call Duration,
+Status, CreatedOn, Lead Stage, Lead Source, Lead | Phone Number,
+Lead | Permanent District, Lead | Course) with skewed, repeatable
+distributions: a few callers and sources take most of the calls, each lead
+is called several times and keeps its phone number, district, course,
+source and stage, calls fall in working hours, and missed calls have no
+duration.
+
+Run from the repository root:  python -m benchmarks.synthetic rows [path.csv|path.xlsx]
+"""
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+
+import config
+
+# Sizes the benchmark suite runs at
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+COLUMNS = [
+    "ActivityEvent", "Owner", "Call Duration", "Status", "CreatedOn", "Lead Stage", "Lead Source",
+    "Lead | Phone Number", "Lead | Permanent District", "Lead | Course",
+]
+
+ACTIVITIES = {"Outbound Phone Call": 0.7, "Inbound Phone Call": 0.2, "Missed Call": 0.1}
+LEAD_STAGES = {
+    "Prospect": 0.35, "Contacted": 0.2, "Interested": 0.15, "Not Interested": 0.12,
+    "Application Submitted": 0.08, "Admission Confirmed": 0.05, "Invalid": 0.05,
+}
+LEAD_SOURCES = [
+    "Facebook", "Google Ads", "Website", "Walk-in", "Referral", "Instagram", "Newspaper",
+    "Education Fair", "YouTube", "SMS Campaign", "School Visit", "Alumni",
+]
+DISTRICTS = [
+    "West Tripura", "Sepahijala", "Gomati", "South Tripura", "Dhalai", "Khowai", "Unakoti", "North Tripura",
+]
+COURSES = [
+    "B.Tech", "BBA", "BCA", "B.Com", "B.Sc Nursing", "MBA", "MCA", "M.Tech", "Diploma", "B.Pharm",
+    "D.Pharm", "BA LLB", "B.Ed", "M.Sc", "BHM",
+]
+# Callers that are not in owner_groups.json end up in the Unknown group
+EXTRA_OWNERS = ["New Joiner 1", "New Joiner 2", "Intern"]
+
+
+def zipf_weights(n, skew=1.1):
+    weights = 1 / np.arange(1, n + 1) ** skew
+    return weights / weights.sum()
+
+
+def owners():
+    with open(config.OWNER_GROUPS_FILE) as f:
+        groups = json.load(f)
+    return [owner for members in groups.values() for owner in members] + EXTRA_OWNERS
+
+
+def format_durations(seconds):
+    """ Durations as the CRM writes them ("0h:1m:35s", or "1h:20s" when the minutes are zero) """
+    uniques, codes = np.unique(np.asarray(seconds, dtype=np.int64), return_inverse=True)
+    h, m, s = uniques // 3600, uniques // 60 % 60, uniques % 60
+    text = np.array([f"{a}h:{c}s" if a and not b else f"{a}h:{b}m:{c}s" for a, b, c in zip(h, m, s)], dtype=object)
+    return text[codes]
+
+
+def make_call_log(rows, seed=0, start="2025-01-01", days=90, calls_per_lead=4):
+    """ Raw (unprocessed) call log DataFrame of `rows` calls """
+    rng = np.random.default_rng(seed)
+
+    # Leads: a fixed profile each, some called far more often than others
+    n_leads = max(1, rows // calls_per_lead)
+    leads = pd.DataFrame({
+        "Lead Stage": rng.choice(list(LEAD_STAGES), n_leads, p=list(LEAD_STAGES.values())),
+        "Lead Source": rng.choice(LEAD_SOURCES, n_leads, p=zipf_weights(len(LEAD_SOURCES))),
+        "Lead | Phone Number": rng.choice(10_000_000_000 - 6_000_000_000, n_leads, replace=False) + 6_000_000_000,
+        "Lead | Permanent District": rng.choice(DISTRICTS, n_leads, p=zipf_weights(len(DISTRICTS), 0.8)),
+        "Lead | Course": rng.choice(COURSES, n_leads, p=zipf_weights(len(COURSES))),
+    })
+    leads["Lead | Phone Number"] = leads["Lead | Phone Number"].astype(str)
+    leads.loc[rng.random(n_leads) < 0.04, "Lead | Permanent District"] = None
+    calls = leads.iloc[rng.choice(n_leads, rows, p=zipf_weights(n_leads, 0.6))].reset_index(drop=True)
+
+    names = rng.permutation(owners())  # so the busiest callers are spread across groups
+    activity = rng.choice(list(ACTIVITIES), rows, p=list(ACTIVITIES.values()))
+    missed = activity == "Missed Call"
+    answered = ~missed & (rng.random(rows) < 0.65)
+
+    # Answered calls last minutes (long tail past an hour); unanswered ones ring for seconds
+    seconds = np.where(answered, rng.lognormal(5, 1, rows), rng.integers(0, 45, rows)).clip(0, 3 * 3600)
+    durations = pd.Series(format_durations(seconds), dtype=object)
+    durations[missed] = None
+
+    # Working hours (09:00-19:00), Monday to Saturday
+    day = pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, rows), unit="D")
+    day = day + pd.to_timedelta((day.dayofweek == 6).astype(int), unit="D")
+    created_on = day + pd.to_timedelta(rng.integers(9 * 3600, 19 * 3600, rows), unit="s")
+
+    df = pd.DataFrame({
+        "ActivityEvent": activity,
+        "Owner": rng.choice(names, rows, p=zipf_weights(len(names), 0.7)),
+        "Call Duration": durations,
+        "Status": np.where(answered, "Answered", np.where(missed, "Missed", "Not Answered")),
+        "CreatedOn": created_on.sort_values().strftime("%Y-%m-%d %H:%M:%S"),
+        **{col: calls[col] for col in leads.columns},
+    })
+    return df[COLUMNS]
+
+
+def write_call_log(path, rows, seed=0):
+    """ Write a synthetic call log to `path` (.csv or .xlsx) and return its bytes """
+    df = make_call_log(rows, seed)
+    if path.endswith(".xlsx"):
+        df.to_excel(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def main(rows, path=None):
+    path = path or f"call_log_{rows}.csv"
+    size = len(write_call_log(path, rows))
+    print(f"wrote {rows:,} rows to {path} ({size / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    rows = SIZES.get(sys.argv[1].lower()) or int(sys.argv[1])
+    main(rows, sys.argv[2] if len(sys.argv) > 2 else None)
@@ -0,0 +1,49 @@
+""" Benchmarks: the report pages on an uploaded synthetic call log of each size.
+
+  update cold   each report page's update callback with the figure cache cleared
+  update warm   the same callback with its figures cached
+  pdf           each report page's PDF job body, charts rendered with kaleido
+"""
+import pytest
+
+from benchmarks.conftest import callback
+from utils.figure_cache import figure_cache
+from utils.jobs import Job
+
+# Update callbacks by output id
+PAGES = {
+    "caller": "caller-summary-table.children",
+    "group": "group-reports-content.children",
+    "district": "district-reports-content.children",
+    "source": "source-reports-content.children",
+}
+
+
+def page_update(app, token, page):
+    """ The page's update callback, and its arguments for the whole dataset """
+    update, n_args = callback(app, PAGES[page])
+    return update, [token] + [None] * (n_args - 1)
+
+
+@pytest.mark.parametrize("page", PAGES)
+def test_update_cold(benchmark, app, token, page, rounds):
+    update, args = page_update(app, token, page)
+    benchmark.pedantic(update, args=args, setup=figure_cache.clear, rounds=rounds)
+
+
+@pytest.mark.parametrize("page", PAGES)
+def test_update_warm(benchmark, app, token, page):
+    update, args = page_update(app, token, page)
+    update(*args)
+    benchmark(update, *args)
+
+
+@pytest.mark.parametrize("build", [
+    "pages.group_reports.build_group_pdf",
+    "pages.district_reports.build_district_pdf",
+    "pages.source_reports.build_source_pdf",
+], ids=["group", "district", "source"])
+def test_pdf(benchmark, render_pool, token, build, rounds):
+    module, name = build.rsplit(".", 1)
+    build = getattr(__import__(module, fromlist=[name]), name)
+    benchmark.pedantic(build, setup=lambda: ((Job(), token), {}), rounds=rounds)
@@ -0,0 +1,31 @@
+""" Benchmarks: the upload path on each synthetic call log size.
+
+  process_data      the raw frame through `process_data`
+  read_upload       parsing + processing a base64 CSV upload (no snapshot)
+  upload callback   the Home page upload callback on a fresh file (snapshots, cube, index)
+"""
+import config
+from benchmarks.conftest import callback, use_temporary_dirs
+from utils.data_processing import process_data
+from utils.ingest import read_upload
+
+
+def test_process_data(benchmark, call_log, rounds):
+    # process_data adds columns to its input, so each round gets its own copy (not timed)
+    benchmark.pedantic(
+        process_data, setup=lambda: ((call_log.copy(),), {"compact": config.COMPACT_DTYPES}), rounds=rounds,
+    )
+
+
+def test_read_upload(benchmark, upload):
+    benchmark(read_upload, *upload)
+
+
+def test_upload_callback(benchmark, app, upload, rounds):
+    contents, filename = upload
+    update_output, _ = callback(app, "output-data-upload.children")
+    # Empty snapshot directories each round, so the file is never already known
+    token = benchmark.pedantic(
+        lambda: update_output([contents], [filename], "replace", None)[-1], setup=use_temporary_dirs, rounds=rounds,
+    )
+    assert token is not None
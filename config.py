@@ -0,0 +1,69 @@
+import json
+import os
+
+# Server-side dataset cache (see utils/dataset_cache.py)
+DATASET_CACHE_MAX_ITEMS = int(os.environ.get("DATASET_CACHE_MAX_ITEMS", 8))
+DATASET_CACHE_TTL_SECONDS = int(os.environ.get("DATASET_CACHE_TTL_SECONDS", 4 * 60 * 60))
+DATASET_CACHE_MAX_BYTES = int(os.environ.get("DATASET_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+# Convert processed uploads to categorical/downcast dtypes (see utils.data_processing.compact_dtypes)
+COMPACT_DTYPES = os.environ.get("COMPACT_DTYPES", "1") != "0"
+
+# Streaming upload ingestion (see utils/ingest.py)
+INGEST_CHUNK_ROWS = int(os.environ.get("INGEST_CHUNK_ROWS", 100_000))
+INGEST_DECODE_BLOCK = 4 * 256 * 1024  # base64 characters per decode step; must be a multiple of 4
+
+# Memoized report figures (see utils/figure_cache.py)
+FIGURE_CACHE_MAX_ITEMS = int(os.environ.get("FIGURE_CACHE_MAX_ITEMS", 256))
+FIGURE_CACHE_MAX_BYTES = int(os.environ.get("FIGURE_CACHE_MAX_BYTES", 256 * 1024 ** 2))
+
+# Roll-ups each aggregate cube (and matrices each cross-tab) keeps, least recently used dropped first
+ROLLUP_CACHE_MAX_BYTES = int(os.environ.get("ROLLUP_CACHE_MAX_BYTES", 16 * 1024 ** 2))
+
+# Threads building one callback's figures concurrently (see utils/figure_scheduler.py); 1 builds them inline
+FIGURE_BUILD_THREADS = int(os.environ.get("FIGURE_BUILD_THREADS", min(4, os.cpu_count() or 1)))
+
+# Dash responses encoded with "orjson" when it is installed, or "plotly" for Dash's own encoder (see utils/serialization.py)
+JSON_ENCODER = os.environ.get("JSON_ENCODER", "orjson")
+
+# Background PDF export jobs (see utils/jobs.py)
+EXPORT_JOB_THREADS = int(os.environ.get("EXPORT_JOB_THREADS", 2))
+EXPORT_RENDER_PROCESSES = int(os.environ.get("EXPORT_RENDER_PROCESSES", 2))
+EXPORT_JOB_TTL_SECONDS = int(os.environ.get("EXPORT_JOB_TTL_SECONDS", 15 * 60))
+
+# Parquet snapshots of processed uploads (see utils/snapshots.py)
+DATA_DIR = os.environ.get("DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+SNAPSHOT_MAX_BYTES = int(os.environ.get("SNAPSHOT_MAX_BYTES", 5 * 1024 ** 3))
+
+# Uncompressed Arrow copies of the snapshots that gunicorn workers memory-map
+# instead of each holding their own frame; empty SHARED_DIR disables them
+SHARED_DIR = os.environ.get("SHARED_DIR", "/dev/shm/dash-reports" if os.path.isdir("/dev/shm") else "")
+SHARED_MAX_BYTES = int(os.environ.get("SHARED_MAX_BYTES", 2 * 1024 ** 3))
+
+# Owner -> group assignments ({"group": ["owner", ...]}); edits are picked up
+# without a restart, checked at most every OWNER_GROUPS_POLL_SECONDS (see utils/owner_groups.py)
+OWNER_GROUPS_FILE = os.environ.get("OWNER_GROUPS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "owner_groups.json"))
+OWNER_GROUPS_POLL_SECONDS = float(os.environ.get("OWNER_GROUPS_POLL_SECONDS", 5))
+
+# Client-side rendering budgets for report figures (see utils/rendering.py).
+# Series above WEBGL_POINT_THRESHOLD points are drawn with WebGL; `points`
+# caps what a time series sends (LTTB or min-max downsampling) and
+# `categories` caps the bars/bubbles on a category axis, folding the rest
+# into "Other". FIGURE_BUDGETS may be overridden with a JSON object.
+WEBGL_POINT_THRESHOLD = int(os.environ.get("WEBGL_POINT_THRESHOLD", 1000))
+TIMESERIES_DOWNSAMPLING = os.environ.get("TIMESERIES_DOWNSAMPLING", "lttb")  # or "minmax"
+FIGURE_BUDGETS = {
+    "caller-volume": {"points": 2000},
+    "caller-stages": {"categories": 30},
+    "group-bubbles": {"categories": 40},
+    "group-top-callers": {"categories": 30},
+    "district-bars": {"categories": 25},
+    "source-bars": {"categories": 25},
+    **json.loads(os.environ.get("FIGURE_BUDGETS", "{}")),
+}
+
+# Distinct phone numbers per cross-tab cell (see utils/crosstab.py): counted
+# exactly up to DISTINCT_EXACT_MAX_ROWS selected rows, estimated with
+# HyperLogLog sketches of 2**HLL_PRECISION registers above that
+DISTINCT_EXACT_MAX_ROWS = int(os.environ.get("DISTINCT_EXACT_MAX_ROWS", 5_000_000))
+HLL_PRECISION = int(os.environ.get("HLL_PRECISION", 12))
@@ -1,33 +1,80 @@
 import dash
-from dash import dcc, html
+from dash import dcc, html, ctx, no_update
 import dash_bootstrap_components as dbc
 from dash.dependencies import Input, Output, State
-import pandas as pd
-import plotly.express as px
+from utils.data_processing import column_values
+from utils.dataset_cache import get_dataset
+from utils.aggregates import get_cube
+from utils.crosstab import count_by, COUNT_MODES, DEFAULT_COUNT_MODE
+from utils.filter_index import get_filter_index
+from utils.figure_cache import figure_cache, normalize_filters
+from utils.owner_groups import groups_version
+from utils.timeseries import get_timeseries, DEFAULT_GRANULARITY
+from utils.rendering import budget, downsample, figure_patch, fold_categories, render_mode
+from utils.metrics import phase
+
+# Columns the filter dropdowns are built from
+FILTER_COLUMNS = ["Owner", "Lead Source", "Lead | Course", "Lead | Permanent District", "ActivityEvent", "Lead Stage", "Group"]
+
+# What each visual is built from (keys of `applied_state`)
+VISUAL_INPUTS = {
+    'summary': ['data', 'groups', 'filters', 'mode'],
+    'volume': ['data', 'groups', 'filters', 'granularity', 'start', 'end'],
+    'stages': ['data', 'groups', 'filters', 'mode'],
+    'funnel': ['data', 'groups', 'filters', 'mode'],
+}
+
+HIDDEN = {'display': 'none'}
 
 # Layout
-layout = html.Div([
-    dcc.Store(id='processed-data-store'), 
-    html.H2("Caller Reports", className="text-center text-white mt-3"),
-
-    dbc.Container(fluid=True, children=[
-        dbc.Row([
-            dbc.Col(dcc.Dropdown(id='owner-filter', options=[], multi=True, placeholder="Select Owners"), width=12, md=6, lg=3, className="mb-2"),
-            dbc.Col(dcc.Dropdown(id='source-filter', options=[], multi=True, placeholder="Select Source"), width=12, md=6, lg=3, className="mb-2"),
-            dbc.Col(dcc.Dropdown(id='course-filter', options=[], multi=True, placeholder="Select Course"), width=12, md=6, lg=3, className="mb-2"),
-            dbc.Col(dcc.Dropdown(id='district-filter', options=[], multi=True, placeholder="Select Permanent District"), width=12, md=6, lg=3, className="mb-2"),
-            dbc.Col(dcc.Dropdown(id='activity-filter', options=[], multi=True, placeholder="Select Activity Event"), width=12, md=6, lg=3, className="mb-2"),
-            dbc.Col(dcc.Dropdown(id='status-filter', options=[], multi=True, placeholder="Select Status"), width=12, md=6, lg=3, className="mb-2"),
-            dbc.Col(dcc.Dropdown(id='group-filter', options=[], multi=True, placeholder="Select Group"), width=12, md=6, lg=3, className="mb-2"),
-        ], className="mt-3"),
-
-        dcc.Loading(
-            id="loading-caller-reports",
-            type="circle",
-            children=[html.Div(id='caller-reports-content', className="mt-3")]
-        )
-    ], className="mt-4")
-])
+def layout():
+    return html.Div([
+        html.H2("Caller Reports", className="text-center text-white mt-3"),
+
+        dbc.Container(fluid=True, children=[
+            dbc.Row([
+                dbc.Col(dcc.Dropdown(id='owner-filter', options=[], multi=True, placeholder="Select Owners"), width=12, md=6, lg=3, className="mb-2"),
+                dbc.Col(dcc.Dropdown(id='source-filter', options=[], multi=True, placeholder="Select Source"), width=12, md=6, lg=3, className="mb-2"),
+                dbc.Col(dcc.Dropdown(id='course-filter', options=[], multi=True, placeholder="Select Course"), width=12, md=6, lg=3, className="mb-2"),
+                dbc.Col(dcc.Dropdown(id='district-filter', options=[], multi=True, placeholder="Select Permanent District"), width=12, md=6, lg=3, className="mb-2"),
+                dbc.Col(dcc.Dropdown(id='activity-filter', options=[], multi=True, placeholder="Select Activity Event"), width=12, md=6, lg=3, className="mb-2"),
+                dbc.Col(dcc.Dropdown(id='status-filter', options=[], multi=True, placeholder="Select Status"), width=12, md=6, lg=3, className="mb-2"),
+                dbc.Col(dcc.Dropdown(id='group-filter', options=[], multi=True, placeholder="Select Group"), width=12, md=6, lg=3, className="mb-2"),
+                # Filter changes are batched until Apply, so picking several values recomputes once
+                dbc.Col(dbc.Button("Apply Filters", id='caller-apply', color="primary", className="w-100"), width=12, md=6, lg=3, className="mb-2"),
+            ], className="mt-3"),
+
+            # Call volume chart controls, and whether the stage charts count calls or unique leads
+            dbc.Row([
+                dbc.Col(dcc.DatePickerRange(id='caller-date-range', clearable=True), width=12, md=4, className="mb-2"),
+                dbc.Col(dbc.RadioItems(
+                    id='caller-granularity',
+                    options=[{'label': 'Hourly', 'value': 'h'}, {'label': 'Daily', 'value': 'D'}, {'label': 'Weekly', 'value': 'W'}],
+                    value=DEFAULT_GRANULARITY,
+                    inline=True,
+                ), width=12, md=4, className="mb-2"),
+                dbc.Col(dbc.RadioItems(
+                    id='caller-count-mode',
+                    options=[{'label': label, 'value': mode} for mode, label in COUNT_MODES.items()],
+                    value=DEFAULT_COUNT_MODE,
+                    inline=True,
+                ), width=12, md=4, className="mb-2"),
+            ]),
+
+            dcc.Store(id='caller-applied'),
+            html.Div(id='caller-message', className="mt-3"),
+            dcc.Loading(
+                id="loading-caller-reports",
+                type="circle",
+                children=[html.Div(id='caller-visuals', className="container-fluid mt-3", children=[
+                    html.Div(id='caller-summary-table'),
+                    dcc.Graph(id='caller-volume-chart', style={'width': '100%', 'height': 'auto'}),
+                    dcc.Graph(id='caller-stage-chart', style={'width': '100%', 'height': 'auto'}),
+                    dcc.Graph(id='caller-funnel-chart', style={'width': '100%', 'height': 'auto'}),
+                ])]
+            )
+        ], className="mt-4")
+    ])
 
 # Register Callbacks
 def register_callbacks(app):
@@ -42,120 +89,186 @@ def register_callbacks(app):
             Output('activity-filter', 'options'),
             Output('status-filter', 'options'),
             Output('group-filter', 'options'),
+            Output('caller-date-range', 'min_date_allowed'),
+            Output('caller-date-range', 'max_date_allowed'),
         ],
         Input('processed-data-store', 'data')
     )
     def update_dropdown_options(data):
-        if not data:
-            return [[], [], [], [], [], [], []]  
-
-        df = pd.read_json(data, orient='split')
+        df = get_dataset(data, FILTER_COLUMNS + ['CreatedOn'])
+        if df is None:
+            return [[], [], [], [], [], [], [], None, None]
 
+        # Without call dates the date picker is left unbounded
+        first, last = get_timeseries(data).bounds() if 'CreatedOn' in df.columns else (None, None)
         return [
-            [{"label": i, "value": i} for i in df["Owner"].dropna().unique()],
-            [{"label": i, "value": i} for i in df["Lead Source"].dropna().unique()],
-            [{"label": i, "value": i} for i in df["Lead | Course"].dropna().unique()],
-            [{"label": i, "value": i} for i in df["Lead | Permanent District"].dropna().unique()],
-            [{"label": i, "value": i} for i in df["ActivityEvent"].dropna().unique()],
-            [{"label": i, "value": i} for i in df["Lead Stage"].dropna().unique()],
-            [{"label": i, "value": i} for i in df["Group"].dropna().unique()],
+            [{"label": i, "value": i} for i in column_values(df, "Owner")],
+            [{"label": i, "value": i} for i in column_values(df, "Lead Source")],
+            [{"label": i, "value": i} for i in column_values(df, "Lead | Course")],
+            [{"label": i, "value": i} for i in column_values(df, "Lead | Permanent District")],
+            [{"label": i, "value": i} for i in column_values(df, "ActivityEvent")],
+            [{"label": i, "value": i} for i in column_values(df, "Lead Stage")],
+            [{"label": i, "value": i} for i in column_values(df, "Group")],
+            first.date() if first is not None else None,
+            last.date() if last is not None else None,
         ]
 
+    # Filters are State, read only when Apply is pressed (or for a new dataset) and kept in
+    # `caller-applied` until then; the chart controls apply at once.
+    # Each visual is its own output and is only rebuilt when something it depends on changed.
     @app.callback(
-        Output('caller-reports-content', 'children'),
+        [
+            Output('caller-message', 'children'),
+            Output('caller-visuals', 'style'),
+            Output('caller-summary-table', 'children'),
+            Output('caller-volume-chart', 'figure'),
+            Output('caller-stage-chart', 'figure'),
+            Output('caller-funnel-chart', 'figure'),
+            Output('caller-applied', 'data'),
+        ],
         [
             Input('processed-data-store', 'data'),
-            Input('owner-filter', 'value'),
-            Input('source-filter', 'value'),
-            Input('course-filter', 'value'),
-            Input('district-filter', 'value'),
-            Input('activity-filter', 'value'),
-            Input('status-filter', 'value'),
-            Input('group-filter', 'value')
+            Input('caller-apply', 'n_clicks'),
+            Input('caller-granularity', 'value'),
+            Input('caller-date-range', 'start_date'),
+            Input('caller-date-range', 'end_date'),
+            Input('caller-count-mode', 'value'),
+        ],
+        [
+            State('owner-filter', 'value'),
+            State('source-filter', 'value'),
+            State('course-filter', 'value'),
+            State('district-filter', 'value'),
+            State('activity-filter', 'value'),
+            State('status-filter', 'value'),
+            State('group-filter', 'value'),
+            State('caller-applied', 'data'),
         ]
     )
-    def update_caller_reports(data, owners, sources, courses, districts, activities, statuses, groups):
-        if not data:
-            return html.Div("No data available. Please upload a file on the Home Page.", className='text-warning')
-
-        df = pd.read_json(data, orient='split')
-
-        # Apply Filters
-        if owners:
-            df = df[df['Owner'].isin(owners)]
-        if sources:
-            df = df[df['Lead Source'].isin(sources)]
-        if courses:
-            df = df[df['Course'].isin(courses)]
-        if districts:
-            df = df[df['PermanentDistrict'].isin(districts)]
-        if activities:
-            df = df[df['Activity Event'].isin(activities)]
-        if statuses:
-            df = df[df['Lead Stage'].isin(statuses)]
-        if groups:
-            df = df[df['Group'].isin(groups)]
-
-        # Caller Summary Table
-        caller_summary = df.groupby('Owner').agg({
-            'Call Duration Seconds': 'sum',
-            'Status': 'count'
-        }).reset_index()
-
-        caller_summary['Total Duration (min)'] = (caller_summary['Call Duration Seconds'] / 60).round(2)
-        caller_summary.rename(columns={'Status': 'Total Calls'}, inplace=True)
-        caller_summary.drop(columns=['Call Duration Seconds'], inplace=True)
-
-        table = dbc.Table.from_dataframe(
-            caller_summary, striped=True, bordered=True, hover=True, className="table-responsive text-white"
-        )
+    def update_caller_reports(data, n_clicks, granularity, start, end, mode, owners, sources, courses, districts, activities, statuses, groups, applied):
+        if get_dataset(data, FILTER_COLUMNS) is None:
+            message = html.Div("No data available. Please upload a file on the Home Page.", className='text-warning')
+            return message, HIDDEN, no_update, no_update, no_update, no_update, None
 
-        # Lead Stage Breakdown
-        lead_stage_summary = df.groupby(['Owner', 'Lead Stage']).size().reset_index(name='Stage Count')
-
-        # Create the bar chart
-        stage_chart = dcc.Graph(
-            figure=px.bar(
-                lead_stage_summary, x="Owner", y="Stage Count", color="Lead Stage",
-                title="Total Calls by Caller (Lead Stage Breakdown)",
-                template="plotly_dark"
-            ),
-            style={'width': '100%', 'height': 'auto'}
-        )
+        if applied is None or applied['data'] != data or ctx.triggered_id == 'caller-apply':
+            filters = {
+                'Owner': owners,
+                'Lead Source': sources,
+                'Lead | Course': courses,
+                'Lead | Permanent District': districts,
+                'ActivityEvent': activities,
+                'Lead Stage': statuses,
+                'Group': groups,
+            }
+        else:
+            # Dropdown edits wait for Apply; the chart controls reuse the last applied filters
+            filters = applied['selected']
+        granularity = granularity or DEFAULT_GRANULARITY
+        mode = mode or DEFAULT_COUNT_MODE
+        state = applied_state(data, filters, granularity, start, end, mode)
 
-        # Line Chart for Call Counts Over Time
-        df['CreatedOn'] = pd.to_datetime(df['CreatedOn'])
-        call_counts_over_time = df.resample('h', on='CreatedOn').size().reset_index(name='Call Count')
+        def stale(visual):
+            return applied is None or any(applied.get(key) != state[key] for key in VISUAL_INPUTS[visual])
 
-        line_chart = dcc.Graph(
-            figure=px.line(
-                call_counts_over_time, x='CreatedOn', y='Call Count', title="Call Counts Over Time",
-                template="plotly_dark", markers=True
-            ),
-            style={'width': '100%', 'height': 'auto'}
-        )
+        def show(figure):
+            # Once a chart is on screen only its traces are sent; the layout and template stay
+            return figure if applied is None else figure_patch(figure)
+
+        version, normalized = groups_version(), normalize_filters(filters)
+        table = volume = stages = funnel = no_update
+        if stale('summary'):
+            caller_summary = figure_cache.get_or_build(
+                (data, 'caller-summary', version, normalized, mode), lambda: build_caller_summary(data, filters, mode)
+            )
+            table = dbc.Table.from_dataframe(
+                caller_summary, striped=True, bordered=True, hover=True, className="table-responsive text-white"
+            )
+        if stale('volume'):
+            volume = show(figure_cache.get_or_build(
+                (data, 'caller-volume', version, normalized, granularity, start, end),
+                lambda: build_volume_chart(data, filters, granularity, start, end)
+            ))
+        if stale('stages'):
+            stages = show(figure_cache.get_or_build(
+                (data, 'caller-stages', version, normalized, mode), lambda: build_stage_chart(data, filters, mode)
+            ))
+        if stale('funnel'):
+            funnel = show(figure_cache.get_or_build(
+                (data, 'caller-funnel', version, normalized, mode), lambda: build_funnel_chart(data, filters, mode)
+            ))
+
+        if applied is None:
+            return None, {}, table, volume, stages, funnel, state
+        return no_update, no_update, table, volume, stages, funnel, state if state != applied else no_update
+
+
+def applied_state(data, filters, granularity, start, end, mode):
+    """ The inputs the visuals were built from, as kept in the `caller-applied` store """
+    return {
+        'data': data,
+        'groups': groups_version(),
+        'filters': {col: sorted(map(str, values)) for col, values in filters.items() if values},
+        'selected': filters,
+        'granularity': granularity,
+        'start': start,
+        'end': end,
+        'mode': mode,
+    }
+
+# Summary table data for one filter state
+def build_caller_summary(token, filters, mode=DEFAULT_COUNT_MODE):
+    with phase("aggregate"):
+        caller_summary = get_cube(token).query(['Owner'], filters)
+        caller_summary['Total Duration (min)'] = (caller_summary['Duration'] / 60).round(2)
+        caller_summary = caller_summary.rename(columns={'Status Count': 'Total Calls'})[['Owner', 'Total Calls', 'Total Duration (min)']]
+        if mode != 'calls':
+            leads = count_by(token, ['Owner'], filters, mode).rename(columns={'Count': 'Unique Leads'})
+            caller_summary = caller_summary.merge(leads, on='Owner', how='left').fillna({'Unique Leads': 0})
+
+    return caller_summary
 
-        # Stacked Bar Chart for Lead Stages
-        lead_stage_chart = dcc.Graph(
-            figure=px.bar(
-                lead_stage_summary, x="Owner", y="Stage Count", color="Lead Stage",
-                title="Lead Stage Distribution by Owner", template="plotly_dark",
-                text_auto=True, barmode="stack"
-            ),
-            style={'width': '100%', 'height': 'auto'}
+# Line Chart for Call Counts Over Time
+def build_volume_chart(token, filters, granularity=DEFAULT_GRANULARITY, start=None, end=None):
+    import plotly.express as px
+
+    with phase("aggregate"):
+        # Rolled up from the per-minute time series; the filters are resolved
+        # to row positions through the bitmap index
+        rows = get_filter_index(token).rows(filters)
+        call_counts_over_time = get_timeseries(token).series(granularity, rows, start, end)
+        call_counts_over_time = downsample(call_counts_over_time, 'CreatedOn', 'Call Count', budget('caller-volume', 'points'))
+
+    with phase("figures"):
+        return px.line(
+            call_counts_over_time, x='CreatedOn', y='Call Count', title="Call Counts Over Time",
+            template="plotly_dark", markers=True, render_mode=render_mode(len(call_counts_over_time))
         )
 
-        # Funnel Chart for Lead Stages
-        funnel_chart = dcc.Graph(
-            figure=px.funnel(
-                df.groupby('Lead Stage').size().reset_index(name='Count'), 
-                x='Lead Stage', y='Count', title="Funnel Chart of Lead Stages",
-                template="plotly_dark"
-            ),
-            style={'width': '100%', 'height': 'auto'}
+# Stacked Bar Chart for Lead Stages (calls or unique leads, per `mode`)
+def build_stage_chart(token, filters, mode=DEFAULT_COUNT_MODE):
+    import plotly.express as px
+
+    with phase("aggregate"):
+        lead_stage_summary = count_by(token, ['Owner', 'Lead Stage'], filters, mode).rename(columns={'Count': 'Stage Count'})
+        lead_stage_summary = fold_categories(lead_stage_summary, 'Owner', ['Stage Count'], budget('caller-stages', 'categories'), by=['Lead Stage'])
+
+    with phase("figures"):
+        return px.bar(
+            lead_stage_summary, x="Owner", y="Stage Count", color="Lead Stage",
+            title="Lead Stage Distribution by Owner", template="plotly_dark",
+            text_auto=True, barmode="stack"
         )
 
-        return html.Div([
-            table, line_chart, lead_stage_chart, funnel_chart
-        ], className="container-fluid")
+# Funnel Chart for Lead Stages
+def build_funnel_chart(token, filters, mode=DEFAULT_COUNT_MODE):
+    import plotly.express as px
+
+    with phase("aggregate"):
+        stage_counts = count_by(token, ['Lead Stage'], filters, mode)
 
+    with phase("figures"):
+        return px.funnel(
+            stage_counts,
+            x='Lead Stage', y='Count', title="Funnel Chart of Lead Stages",
+            template="plotly_dark"
+        )
@@ -1,7 +1,8 @@
 # pages/stream_reports.py
 from dash import html, dcc
 
-layout = html.Div([
-    html.H1("Stream-Wise Reports"),
-    dcc.Graph(id="stream-graph")
-])
+def layout():
+    return html.Div([
+        html.H1("Stream-Wise Reports"),
+        dcc.Graph(id="stream-graph")
+    ])
@@ -1,46 +1,63 @@
 import dash
-from dash import dcc, html
+from dash import dcc, html, ctx
 import dash_bootstrap_components as dbc
 from dash.dependencies import Input, Output, State
-import pandas as pd
-import plotly.express as px
-import tempfile
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from reportlab.lib.pagesizes import A3
-import os
-from flask import send_file
+from utils.data_processing import column_values
+from utils.dataset_cache import get_dataset
+from utils.aggregates import get_cube
+from utils.crosstab import count_by, count_matrix, COUNT_MODES, DEFAULT_COUNT_MODE
+from utils.figure_cache import figure_cache, normalize_filters
+from utils.figure_scheduler import figure_scheduler
+from utils.owner_groups import groups_version
+from utils.pdf_export import export_outputs, export_pdf
+from utils.rendering import budget, fold_categories
+from utils.metrics import phase
+
+# Columns the filter dropdowns are built from
+FILTER_COLUMNS = ["Group", "Owner", "Lead | Course", "Lead Source"]
 
 # Layout
-layout = html.Div([
-    dcc.Store(id='processed-data-store'),
-    html.H2("District Reports", className="text-center text-white"),
+def layout():
+    return html.Div([
+        html.H2("District Reports", className="text-center text-white"),
     
-    # Filters Section
-    dbc.Container([
-        dbc.Row([
-            dbc.Col(dcc.Dropdown(id='district-group-filter', multi=True, placeholder="Select Group"), xs=12, sm=6, md=3),
-            dbc.Col(dcc.Dropdown(id='district-owner-filter', multi=True, placeholder="Select Owner"), xs=12, sm=6, md=3),
-            dbc.Col(dcc.Dropdown(id='district-source-filter', multi=True, placeholder="Select Source"), xs=12, sm=6, md=3),
-            dbc.Col(dcc.Dropdown(id='district-course-filter', multi=True, placeholder="Select Course"), xs=12, sm=6, md=3),
-        ], className="mb-3"),     
-    ]),   
+        # Filters Section
+        dbc.Container([
+            dbc.Row([
+                dbc.Col(dcc.Dropdown(id='district-group-filter', multi=True, placeholder="Select Group"), xs=12, sm=6, md=3),
+                dbc.Col(dcc.Dropdown(id='district-owner-filter', multi=True, placeholder="Select Owner"), xs=12, sm=6, md=3),
+                dbc.Col(dcc.Dropdown(id='district-source-filter', multi=True, placeholder="Select Source"), xs=12, sm=6, md=3),
+                dbc.Col(dcc.Dropdown(id='district-course-filter', multi=True, placeholder="Select Course"), xs=12, sm=6, md=3),
+            ], className="mb-3"),
+            # Count calls or unique leads
+            dbc.Row([
+                dbc.Col(dbc.RadioItems(
+                    id='district-count-mode',
+                    options=[{'label': label, 'value': mode} for mode, label in COUNT_MODES.items()],
+                    value=DEFAULT_COUNT_MODE,
+                    inline=True,
+                ), xs=12),
+            ], className="mb-3"),
+        ]),   
     
-    # Loading Component
-    dbc.Container([
-        dcc.Loading(
-            id="loading-district-reports",
-            type="circle",
-            children=[html.Div(id='district-reports-content', className="mt-3")]
-        )
-    ], className="mt-4"),
+        # Loading Component
+        dbc.Container([
+            dcc.Loading(
+                id="loading-district-reports",
+                type="circle",
+                children=[html.Div(id='district-reports-content', className="mt-3")]
+            )
+        ], className="mt-4"),
 
-    # Download PDF Button
-    dbc.Container([
-        html.Div(html.Button("Download Report as PDF", id="district-download-pdf", className="btn btn-primary mt-3"), className="text-center"),
-        dcc.Download(id="district-pdf-download-link")
-    ], className="mt-3")
-])
+        # Download PDF Button
+        dbc.Container([
+            html.Div(html.Button("Download Report as PDF", id="district-download-pdf", className="btn btn-primary mt-3"), className="text-center"),
+            dbc.Progress(id="district-pdf-progress", value=0, striped=True, animated=True, className="mt-2", style={"display": "none"}),
+            dcc.Interval(id="district-pdf-poll", interval=1000, disabled=True),
+            dcc.Store(id="district-pdf-job"),
+            dcc.Download(id="district-pdf-download-link")
+        ], className="mt-3")
+    ])
 
 # Register Callbacks
 def register_callbacks(app):
@@ -52,14 +69,14 @@ def register_callbacks(app):
         Input('processed-data-store', 'data')
     )
     def populate_filters(data):
-        if not data:
+        df = get_dataset(data, FILTER_COLUMNS)
+        if df is None:
             return [], [], [], []
-        df = pd.read_json(data, orient='split')
         return [
-            [{'label': group, 'value': group} for group in df['Group'].dropna().unique()],
-            [{'label': owner, 'value': owner} for owner in df['Owner'].dropna().unique()],
-            [{'label': course, 'value': course} for course in df['Lead | Course'].dropna().unique()],
-            [{'label': source, 'value': source} for source in df['Lead Source'].dropna().unique()]
+            [{'label': group, 'value': group} for group in column_values(df, 'Group')],
+            [{'label': owner, 'value': owner} for owner in column_values(df, 'Owner')],
+            [{'label': course, 'value': course} for course in column_values(df, 'Lead | Course')],
+            [{'label': source, 'value': source} for source in column_values(df, 'Lead Source')]
         ]
     
     @app.callback(
@@ -68,30 +85,71 @@ def register_callbacks(app):
          Input('district-group-filter', 'value'),
          Input('district-owner-filter', 'value'),
          Input('district-course-filter', 'value'),
-         Input('district-source-filter', 'value')]
+         Input('district-source-filter', 'value'),
+         Input('district-count-mode', 'value')]
     )
-    def update_district_reports(data, selected_groups, selected_owners, selected_sources, selected_course):
-        if not data:
+    def update_district_reports(data, selected_groups, selected_owners, selected_course, selected_sources, mode):
+        if get_cube(data) is None:
             return html.Div("No data available. Please upload a file on the Home Page.", className='text-warning')
-        df = pd.read_json(data, orient='split')
 
-        # Apply Filters
-        if selected_groups:
-            df = df[df['Group'].isin(selected_groups)]
-        if selected_owners:
-            df = df[df['Owner'].isin(selected_owners)]
-        if selected_course:
-            df = df[df['Lead | Course'].isin(selected_course)]
-        if selected_sources:
-            df = df[df['Lead Source'].isin(selected_sources)]
-        
-        lead_counts = df.groupby(["Lead | Permanent District", "Lead | Course", "Lead Stage"]).size().reset_index(name="Lead Count")
-        pivot_counts = df.groupby(["Lead | Permanent District", "Lead | Course"]).size().reset_index(name="Pivot Count")
-        pivot_df = pivot_counts.pivot(index="Lead | Permanent District", columns="Lead | Course", values="Pivot Count").fillna(0)
-        
-        return html.Div([
-            dcc.Graph(figure=px.bar(lead_counts, x='Lead | Permanent District', y='Lead Count', color='Lead Stage', barmode='stack', title="District-Wise & Course-Wise Lead Distribution", template="plotly_dark"), style={"width": "100%", "height": "auto"}),
-            dcc.Graph(figure=px.imshow(pivot_df, color_continuous_scale="viridis", title="Lead Distribution Heatmap (District vs Course)", labels={'color': "Lead Count"}, template="plotly_dark"), style={"width": "100%", "height": "auto"}),
-            dcc.Graph(figure=px.sunburst(lead_counts, path=["Lead | Permanent District", "Lead | Course", "Lead Stage"], values='Lead Count', title="Hierarchical View: District → Course → Lead Stage", template="plotly_dark"), style={"width": "100%", "height": "auto"}),
-            dcc.Graph(figure=px.treemap(lead_counts, path=['Lead | Permanent District','Lead | Course','Lead Stage'], values ='Lead Count', title="Treemap: Lead Distribution by District & Course", color_continuous_scale="blues", template="plotly_dark"), style={"width": "100%", "height": "auto"})
-        ])
+        # Aggregate Data (rolled up from the per-dataset cube)
+        filters = {
+            'Group': selected_groups,
+            'Owner': selected_owners,
+            'Lead | Course': selected_course,
+            'Lead Source': selected_sources,
+        }
+        mode = mode or DEFAULT_COUNT_MODE
+        charts = figure_cache.get_or_build(
+            (data, 'district', groups_version(), normalize_filters(filters), mode),
+            lambda: build_district_figures(data, filters, mode)
+        )
+
+        return html.Div([dcc.Graph(figure=chart, style={"width": "100%", "height": "auto"}) for chart in charts])
+
+    # PDF export runs as a background job; the interval polls it until the file is ready
+    @app.callback(
+        [Output("district-pdf-download-link", "data"),
+         Output("district-pdf-job", "data"),
+         Output("district-pdf-poll", "disabled"),
+         Output("district-pdf-progress", "value"),
+         Output("district-pdf-progress", "label"),
+         Output("district-pdf-progress", "style")],
+        [Input("district-download-pdf", "n_clicks"),
+         Input("district-pdf-poll", "n_intervals")],
+        [State('processed-data-store', 'data'),
+         State("district-pdf-job", "data")],
+        prevent_initial_call=True
+    )
+    def generate_pdf(n_clicks, n_intervals, data, job_id):
+        start = ctx.triggered_id == "district-download-pdf"
+        token = data if get_cube(data) is not None else None
+        return export_outputs(start, token, job_id, build_district_pdf, "district_reports.pdf")
+
+# Render the unfiltered district charts to PDF; runs on the job queue
+def build_district_pdf(job, token):
+    charts = build_district_figures(token, {}, serialize=False)
+    titles = ["District & Course Distribution", "District vs Course Heatmap", "District → Course → Lead Stage", "District & Course Treemap"]
+    return export_pdf(job, charts, titles=titles, width=700, height=500, gap=70)
+
+# Build the charts for one filter state; serialized for the page, figures for the PDF export
+def build_district_figures(token, filters, mode=DEFAULT_COUNT_MODE, serialize=True):
+    import plotly.express as px
+
+    with phase("aggregate"):
+        lead_counts = count_by(token, ["Lead | Permanent District", "Lead | Course", "Lead Stage"], filters, mode).rename(columns={"Count": "Lead Count"})
+        # District x course heatmap, counted from the category codes of the filtered rows
+        pivot_df = count_matrix(token, "Lead | Permanent District", "Lead | Course", filters, mode)
+        # Districts beyond the budget are stacked into one "Other" bar
+        district_bars = fold_categories(lead_counts, "Lead | Permanent District", ["Lead Count"], budget("district-bars", "categories"), by=["Lead Stage"])
+
+    with phase("figures"):
+        # Built and serialized concurrently on the figure pool
+        charts = figure_scheduler.build([
+            lambda: px.bar(district_bars, x='Lead | Permanent District', y='Lead Count', color='Lead Stage', barmode='stack', title="District-Wise & Course-Wise Lead Distribution", template="plotly_dark"),
+            lambda: px.imshow(pivot_df, color_continuous_scale="viridis", title="Lead Distribution Heatmap (District vs Course)", labels={'color': "Lead Count"}, template="plotly_dark"),
+            lambda: px.sunburst(lead_counts, path=["Lead | Permanent District", "Lead | Course", "Lead Stage"], values='Lead Count', title="Hierarchical View: District → Course → Lead Stage", template="plotly_dark"),
+            lambda: px.treemap(lead_counts, path=['Lead | Permanent District','Lead | Course','Lead Stage'], values ='Lead Count', title="Treemap: Lead Distribution by District & Course", color_continuous_scale="blues", template="plotly_dark")
+        ], serialize=serialize)
+
+    return charts
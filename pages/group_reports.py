@@ -1,45 +1,62 @@
 import dash
-from dash import dcc, html
+from dash import dcc, html, ctx
 import dash_bootstrap_components as dbc
 from dash.dependencies import Input, Output, State
-import pandas as pd
-import plotly.express as px
-import tempfile
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from reportlab.lib.pagesizes import A3
-import os
-from flask import send_file
+from utils.data_processing import column_values
+from utils.dataset_cache import get_dataset
+from utils.aggregates import get_cube
+from utils.crosstab import count_by, COUNT_MODES, DEFAULT_COUNT_MODE
+from utils.figure_cache import figure_cache, normalize_filters
+from utils.figure_scheduler import figure_scheduler
+from utils.owner_groups import groups_version
+from utils.pdf_export import export_outputs, export_pdf
+from utils.rendering import budget, fold_categories, render_mode
+from utils.metrics import phase
+
+# Columns the filter dropdowns are built from
+FILTER_COLUMNS = ["Group", "Owner", "Lead Source"]
 
 # Layout
-layout = html.Div([
-    dcc.Store(id='processed-data-store'),
-    html.H2("Group Reports", className="text-center text-white"),
+def layout():
+    return html.Div([
+        html.H2("Group Reports", className="text-center text-white"),
     
-    # Filters Section
-    dbc.Container([
-        dbc.Row([
-            dbc.Col(dcc.Dropdown(id='group-group-filter', multi=True, placeholder="Select Group"), width=12, lg=4),
-            dbc.Col(dcc.Dropdown(id='group-owner-filter', multi=True, placeholder="Select Owner"), width=12, lg=4),
-            dbc.Col(dcc.Dropdown(id='group-source-filter', multi=True, placeholder="Select Lead Source"), width=12, lg=4),
-        ], className="mb-3"),
-    ]),
-
-    # Loading Component
-    dbc.Container([
-        dcc.Loading(
-            id="loading-group-reports",
-            type="circle",
-            children=[html.Div(id='group-reports-content', className="mt-3")]
-        )
-    ], className="mt-4"),
+        # Filters Section
+        dbc.Container([
+            dbc.Row([
+                dbc.Col(dcc.Dropdown(id='group-group-filter', multi=True, placeholder="Select Group"), width=12, lg=4),
+                dbc.Col(dcc.Dropdown(id='group-owner-filter', multi=True, placeholder="Select Owner"), width=12, lg=4),
+                dbc.Col(dcc.Dropdown(id='group-source-filter', multi=True, placeholder="Select Lead Source"), width=12, lg=4),
+            ], className="mb-3"),
+            # Count calls or unique leads
+            dbc.Row([
+                dbc.Col(dbc.RadioItems(
+                    id='group-count-mode',
+                    options=[{'label': label, 'value': mode} for mode, label in COUNT_MODES.items()],
+                    value=DEFAULT_COUNT_MODE,
+                    inline=True,
+                ), width=12),
+            ], className="mb-3"),
+        ]),
 
-    # Download PDF Button
-    dbc.Container([
-        html.Button("Download Report as PDF", id="group-download-pdf", className="btn btn-primary mt-3 w-100"),
-        dcc.Download(id="group-pdf-download-link")
-    ], className="mt-3 text-center")
-])
+        # Loading Component
+        dbc.Container([
+            dcc.Loading(
+                id="loading-group-reports",
+                type="circle",
+                children=[html.Div(id='group-reports-content', className="mt-3")]
+            )
+        ], className="mt-4"),
+
+        # Download PDF Button
+        dbc.Container([
+            html.Button("Download Report as PDF", id="group-download-pdf", className="btn btn-primary mt-3 w-100"),
+            dbc.Progress(id="group-pdf-progress", value=0, striped=True, animated=True, className="mt-2", style={"display": "none"}),
+            dcc.Interval(id="group-pdf-poll", interval=1000, disabled=True),
+            dcc.Store(id="group-pdf-job"),
+            dcc.Download(id="group-pdf-download-link")
+        ], className="mt-3 text-center")
+    ])
 
 # Register Callbacks
 def register_callbacks(app):
@@ -50,14 +67,14 @@ def register_callbacks(app):
         Input('processed-data-store', 'data')
     )
     def populate_filters(data):
-        if not data:
+        df = get_dataset(data, FILTER_COLUMNS)
+        if df is None:
             return [], [], []
         
-        df = pd.read_json(data, orient='split')
         return [
-            [{'label': group, 'value': group} for group in df['Group'].unique()],
-            [{'label': owner, 'value': owner} for owner in df['Owner'].unique()],
-            [{'label': source, 'value': source} for source in df['Lead Source'].unique()]
+            [{'label': group, 'value': group} for group in column_values(df, 'Group')],
+            [{'label': owner, 'value': owner} for owner in column_values(df, 'Owner')],
+            [{'label': source, 'value': source} for source in column_values(df, 'Lead Source')]
         ]
 
     @app.callback(
@@ -65,88 +82,92 @@ def register_callbacks(app):
         [Input('processed-data-store', 'data'),
          Input('group-group-filter', 'value'),
          Input('group-owner-filter', 'value'),
-         Input('group-source-filter', 'value')]
+         Input('group-source-filter', 'value'),
+         Input('group-count-mode', 'value')]
     )
-    def update_group_reports(data, selected_groups, selected_owners, selected_sources):
-        if not data:
+    def update_group_reports(data, selected_groups, selected_owners, selected_sources, mode):
+        if get_cube(data) is None:
             return html.Div("No data available. Please upload a file on the Home Page.", className='text-warning')
         
-        df = pd.read_json(data, orient='split')
-
-        # Apply Filters
-        if selected_groups:
-            df = df[df['Group'].isin(selected_groups)]
-        if selected_owners:
-            df = df[df['Owner'].isin(selected_owners)]
-        if selected_sources:
-            df = df[df['Lead Source'].isin(selected_sources)]
-
-        # Aggregate Data
-        lead_counts = df.groupby(["Owner", "Lead Stage", "Group"]).size().reset_index(name="Lead Count")
-
-        # Generate Charts
-        charts = [
-            px.sunburst(df.groupby(['Group', 'Owner', 'Lead Stage']).size().reset_index(name='Count'),
-                        path=['Group', 'Owner', 'Lead Stage'], values='Count',
-                        title="Group Hierarchy: Group → Caller → Lead Stage", template="plotly_dark"),
-            px.scatter(lead_counts, x="Group", y="Owner", size="Lead Count", color="Lead Stage",
-                       title="Bubble Chart: Caller Performance within Groups", hover_name="Owner", template="plotly_dark"),
-            px.funnel(lead_counts, x="Lead Count", y="Lead Stage", color="Group",
-                      title="Lead Stage Breakdown for Each Group", orientation="h", template="plotly_dark"),
-            px.bar(lead_counts, x="Lead Count", y="Owner", color="Group", title="Top Performing Caller in Each Group",
-                   orientation="h", text_auto=True, template="plotly_dark"),
-            px.pie(lead_counts, values="Lead Count", names="Group", title="Lead Distribution by Group", hole=0.4,
-                   template="plotly_dark"),
-            px.treemap(lead_counts, path=["Group", "Owner"], values="Lead Count", title="Treemap: Owner Performance within Groups",
-                       color_continuous_scale="blues", template="plotly_dark")
-        ]
+        filters = {'Group': selected_groups, 'Owner': selected_owners, 'Lead Source': selected_sources}
+        mode = mode or DEFAULT_COUNT_MODE
+        charts = figure_cache.get_or_build(
+            (data, 'group', groups_version(), normalize_filters(filters), mode), lambda: build_group_figures(data, filters, mode)
+        )
 
         return html.Div([dcc.Graph(figure=chart) for chart in charts])
 
+    # PDF export runs as a background job; the interval polls it until the file is ready
     @app.callback(
-        Output("group-pdf-download-link", "data"),
-        Input("group-download-pdf", "n_clicks"),
-        State('processed-data-store', 'data'),
+        [Output("group-pdf-download-link", "data"),
+         Output("group-pdf-job", "data"),
+         Output("group-pdf-poll", "disabled"),
+         Output("group-pdf-progress", "value"),
+         Output("group-pdf-progress", "label"),
+         Output("group-pdf-progress", "style")],
+        [Input("group-download-pdf", "n_clicks"),
+         Input("group-pdf-poll", "n_intervals")],
+        [State('processed-data-store', 'data'),
+         State("group-pdf-job", "data")],
         prevent_initial_call=True
     )
-    def generate_pdf(n_clicks, data):
-        if not data:
-            return None
-
-        df = pd.read_json(data, orient='split')
-        lead_counts = df.groupby(["Owner", "Lead Stage", "Group"]).size().reset_index(name="Lead Count")
-
-        # Generate Charts and Save as Images
-        temp_dir = tempfile.gettempdir()
-        chart_paths = []
-        charts = [
-            px.sunburst(df.groupby(['Group', 'Owner', 'Lead Stage']).size().reset_index(name='Count'),
-                        path=['Group', 'Owner', 'Lead Stage'], values='Count',
-                        title="Group Hierarchy", template="plotly_dark"),
-            px.scatter(lead_counts, x="Group", y="Owner", size="Lead Count", color="Lead Stage", title="Caller Performance",
-                       hover_name="Owner", template="plotly_dark"),
-            px.funnel(lead_counts, x="Lead Count", y="Lead Stage", color="Group", title="Lead Stage Breakdown",
-                      orientation="h", template="plotly_dark"),
-            px.bar(lead_counts, x="Lead Count", y="Owner", color="Group", title="Top Performers", orientation="h",
-                   text_auto=True, template="plotly_dark"),
-        ]
-        
-        for i, chart in enumerate(charts):
-            chart_path = os.path.join(temp_dir, f"chart_{i}.png")
-            chart.write_image(chart_path, format='png')
-            chart_paths.append(chart_path)
-
-        # Create PDF
-        pdf_path = os.path.join(temp_dir, "group_reports.pdf")
-        c = canvas.Canvas(pdf_path, pagesize=A3)
-        y_position = A3[1] - 100
-        for chart_path in chart_paths:
-            if os.path.exists(chart_path):
-                c.drawImage(ImageReader(chart_path), 50, y_position - 400, width=700, height=400)
-                y_position -= 450
-                if y_position < 100:
-                    c.showPage()
-                    y_position = A3[1] - 100
-        c.save()
-
-        return dcc.send_file(pdf_path)
+    def generate_pdf(n_clicks, n_intervals, data, job_id):
+        start = ctx.triggered_id == "group-download-pdf"
+        token = data if get_cube(data) is not None else None
+        return export_outputs(start, token, job_id, build_group_pdf, "group_reports.pdf")
+
+# Build the export charts and render them to PDF; runs on the job queue
+def build_group_pdf(job, token):
+    import plotly.express as px
+
+    cube = get_cube(token)
+    lead_counts = cube.query(["Owner", "Lead Stage", "Group"]).rename(columns={"Count": "Lead Count"})
+
+    # Generate Charts
+    charts = [
+        px.sunburst(cube.query(['Group', 'Owner', 'Lead Stage']),
+                    path=['Group', 'Owner', 'Lead Stage'], values='Count',
+                    title="Group Hierarchy", template="plotly_dark"),
+        px.scatter(lead_counts, x="Group", y="Owner", size="Lead Count", color="Lead Stage", title="Caller Performance",
+                   hover_name="Owner", template="plotly_dark"),
+        px.funnel(lead_counts, x="Lead Count", y="Lead Stage", color="Group", title="Lead Stage Breakdown",
+                  orientation="h", template="plotly_dark"),
+        px.bar(lead_counts, x="Lead Count", y="Owner", color="Group", title="Top Performers", orientation="h",
+               text_auto=True, template="plotly_dark"),
+    ]
+
+    return export_pdf(job, charts, width=700, height=400, gap=50, x=50)
+
+# Build the on-screen charts for one filter state
+def build_group_figures(token, filters, mode=DEFAULT_COUNT_MODE):
+    import plotly.express as px
+
+    with phase("aggregate"):
+        # Aggregate Data (calls rolled up from the per-dataset cube, or unique leads)
+        lead_counts = count_by(token, ["Owner", "Lead Stage", "Group"], filters, mode).rename(columns={"Count": "Lead Count"})
+        # Per-group totals are counted directly: a lead called by several owners is still one lead
+        group_totals = count_by(token, ["Group"], filters, mode).rename(columns={"Count": "Lead Count"})
+        # Callers beyond the budget are shown as "Other" in the bubble and bar charts
+        bubbles = fold_categories(lead_counts, "Owner", ["Lead Count"], budget("group-bubbles", "categories"), by=["Group", "Lead Stage"])
+        top_callers = fold_categories(lead_counts, "Owner", ["Lead Count"], budget("group-top-callers", "categories"), by=["Group"])
+
+    with phase("figures"):
+        # Generate Charts: built and serialized concurrently on the figure pool
+        charts = figure_scheduler.build([
+            lambda: px.sunburst(lead_counts,
+                                path=['Group', 'Owner', 'Lead Stage'], values='Lead Count',
+                                title="Group Hierarchy: Group → Caller → Lead Stage", template="plotly_dark"),
+            lambda: px.scatter(bubbles, x="Group", y="Owner", size="Lead Count", color="Lead Stage",
+                               title="Bubble Chart: Caller Performance within Groups", hover_name="Owner", template="plotly_dark",
+                               render_mode=render_mode(len(bubbles))),
+            lambda: px.funnel(lead_counts, x="Lead Count", y="Lead Stage", color="Group",
+                              title="Lead Stage Breakdown for Each Group", orientation="h", template="plotly_dark"),
+            lambda: px.bar(top_callers, x="Lead Count", y="Owner", color="Group", title="Top Performing Caller in Each Group",
+                           orientation="h", text_auto=True, template="plotly_dark"),
+            lambda: px.pie(group_totals, values="Lead Count", names="Group", title="Lead Distribution by Group", hole=0.4,
+                           template="plotly_dark"),
+            lambda: px.treemap(lead_counts, path=["Group", "Owner"], values="Lead Count", title="Treemap: Owner Performance within Groups",
+                               color_continuous_scale="blues", template="plotly_dark")
+        ], serialize=True)
+
+    return charts
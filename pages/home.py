@@ -1,81 +1,146 @@
-from dash import dcc, html, dash_table
+from dash import dcc, html, dash_table, no_update
 import dash_bootstrap_components as dbc
 from dash.dependencies import Input, Output, State
-import pandas as pd
-import plotly.express as px
-import base64
-import io
-from utils.data_processing import process_data
+from utils.data_processing import format_bytes
+from utils.ingest import ingest_upload, append_upload
+from utils.dataset_cache import get_dataset, store_dataset
+from utils.aggregates import get_cube
+from utils.filter_index import get_filter_index
+from utils.table_query import query_frame, page_records
+
+PREVIEW_PAGE_SIZE = 10
 
 # Layout for Home Page
-layout = html.Div([
-    dcc.Store(id='processed-data-store'),  # Store processed data
-    html.H2("Welcome to KEI Reports", className="text-center text-orange mt-3"),
-    html.H3("Upload Dataset", className="text-left text-blue mt-2"),
+def layout():
+    return html.Div([
+        html.H2("Welcome to KEI Reports", className="text-center text-orange mt-3"),
+        html.H3("Upload Dataset", className="text-left text-blue mt-2"),
     
-    html.H6(
-        "Dataset should have: ActivityEvent, Owner, Call Duration, Status, CreatedOn, Lead Stage, Lead Source, Phone Number, District, Course.",
-        className="note text-muted text-center px-3"
-    ),
-
-    dbc.Container([
-        dcc.Upload(
-            id='upload-data',
-            children=html.Div(['📂 Drag & Drop or ', html.A('Select Files', className="text-primary")]),
-            style={
-                'width': '100%', 'height': '60px', 'lineHeight': '60px',
-                'borderWidth': '1px', 'borderStyle': 'dashed', 'borderRadius': '10px',
-                'textAlign': 'center', 'margin': '10px auto',
-                'backgroundColor': '#343a40', 'color': 'white'
-            },
-            multiple=False
+        html.H6(
+            "Dataset should have: ActivityEvent, Owner, Call Duration, Status, CreatedOn, Lead Stage, Lead Source, Phone Number, District, Course.",
+            className="note text-muted text-center px-3"
         ),
-        dcc.Loading(
-            id="loading",
-            type="circle",
-            children=[html.Div(id='output-data-upload', className="mt-3")]
+
+        dbc.Container([
+            dcc.Upload(
+                id='upload-data',
+                children=html.Div(['📂 Drag & Drop or ', html.A('Select Files', className="text-primary")]),
+                style={
+                    'width': '100%', 'height': '60px', 'lineHeight': '60px',
+                    'borderWidth': '1px', 'borderStyle': 'dashed', 'borderRadius': '10px',
+                    'textAlign': 'center', 'margin': '10px auto',
+                    'backgroundColor': '#343a40', 'color': 'white'
+                },
+                multiple=True
+            ),
+            dbc.RadioItems(
+                id='upload-mode',
+                options=[
+                    {'label': 'Replace dataset', 'value': 'replace'},
+                    {'label': 'Append to current dataset (skips duplicate calls)', 'value': 'append'},
+                ],
+                value='replace',
+                inline=True,
+                className='text-center text-white'
+            ),
+            dcc.Loading(
+                id="loading",
+                type="circle",
+                children=[html.Div(id='output-data-upload', className="mt-3")]
+            )
+        ], className="mt-4", fluid=True),
+
+        html.Div(id='summary-cards', className='mt-4 container-fluid'),
+        html.Div(id='charts', className='mt-4 container-fluid')
+    ])
+
+# Preview of the processed upload
+def parse_contents(df, meta):
+    memory = meta["memory_usage"]
+    append = meta["append"]
+    first_page, page_count = page_records(df, 0, PREVIEW_PAGE_SIZE)
+    return html.Div([
+        html.H5(f'✅ File Uploaded: {meta["filename"]}', className='text-success'),
+        html.Small(
+            f'In-memory size: {format_bytes(memory["before"])} → {format_bytes(memory["after"])}',
+            className='text-muted'
+        ) if memory else None,
+        html.Small(
+            f'Appended {append["added"]} new rows ({append["skipped"]} duplicates skipped), {meta["rows"]} rows in total',
+            className='text-muted'
+        ) if append else None,
+        # Paging, sorting and filtering run on the server (see update_preview_table),
+        # so only one page of rows is ever sent to the browser
+        dash_table.DataTable(
+            id='upload-preview-table',
+            data=first_page,
+            columns=[{'name': i, 'id': i} for i in meta["columns"]],
+            style_table={'overflowX': 'auto', 'backgroundColor': '#212529', 'color': 'white'},
+            style_header={'backgroundColor': 'black', 'color': 'white'},
+            style_data={'backgroundColor': '#343a40', 'color': 'white'},
+            page_current=0,
+            page_size=PREVIEW_PAGE_SIZE,
+            page_count=page_count,
+            page_action="custom",
+            style_cell={'textAlign': 'left', 'padding': '5px'},
+            sort_action="custom",
+            sort_mode="multi",
+            sort_by=[],
+            filter_action="custom",
+            filter_query="",
         )
-    ], className="mt-4", fluid=True),
+    ], className="table-responsive")
+
+def summary_cards(cube):
+    # Totals come from the aggregate cube, which appends update incrementally
+    totals = cube.view([])
+    total_calls = int(totals["Count"].sum())
+    total_duration = int(totals["Duration"].sum() / 60)
+    unique_owners = cube.view(["Owner"])["Owner"].nunique() if "Owner" in cube.dimensions else 0
+
+    return html.Div(
+        dbc.Row([
+            dbc.Col(dbc.Card(dbc.CardBody([
+                html.H4("Total Calls", className="card-title text-center"),
+                html.H3(total_calls, className="values text-center")
+            ]), style={"width": "100%"}), xs=12, sm=6, md=3, className="mb-3 p-2"),
+            
+            dbc.Col(dbc.Card(dbc.CardBody([
+                html.H4("Total Duration (min)", className="card-title text-center"),
+                html.H3(total_duration, className="values text-center")
+            ]), style={"width": "100%"}), xs=12, sm=6, md=3, className="mb-3 p-2"),
+            
+            dbc.Col(dbc.Card(dbc.CardBody([
+                html.H4("Unique Owners", className="card-title text-center"),
+                html.H3(unique_owners, className="values text-center")
+            ]), style={"width": "100%"}), xs=12, sm=6, md=3, className="mb-3 p-2"),
+        ], className="justify-content-center"), className="cards-section container-fluid"
+    )
 
-    html.Div(id='summary-cards', className='mt-4 container-fluid'),
-    html.Div(id='charts', className='mt-4 container-fluid')
-])
+def distribution_charts(df):
+    import plotly.express as px
 
-# Function to parse contents
-def parse_contents(contents, filename):
-    content_type, content_string = contents.split(',')
-    decoded = base64.b64decode(content_string)
+    # Count on the server so only one slice per value is sent to the browser
+    def value_counts(col):
+        counts = df[col].value_counts()
+        return counts[counts > 0].rename_axis(col).reset_index(name="Count")
 
-    try:
-        if filename.endswith('.csv'):
-            df = pd.read_csv(io.StringIO(decoded.decode('utf-8')))
-        elif filename.endswith('.xlsx'):
-            df = pd.read_excel(io.BytesIO(decoded))
-        else:
-            return html.Div(['❌ Unsupported format. Upload CSV or Excel.'], className='text-danger')
+    pie_chart = dcc.Graph(
+        figure=px.pie(value_counts("ActivityEvent"), names="ActivityEvent", values="Count",
+                      title="Activity Event Distribution", hole=0.3, template="plotly_dark"),
+        style={"width": "100%"}
+    )
 
-        # Process data
-        df = process_data(df)
+    donut_chart = dcc.Graph(
+        figure=px.pie(value_counts("Status"), names="Status", values="Count",
+                      title="Status Distribution", hole=0.5, template="plotly_dark"),
+        style={"width": "100%"}
+    )
 
-        if df is None or df.empty:
-            return html.Div(['⚠️ Error: Processed data is empty. Check your file.'], className='text-danger')
-
-        return html.Div([
-            html.H5(f'✅ File Uploaded: {filename}', className='text-success'),
-            dash_table.DataTable(
-                data=df.to_dict('records'),
-                columns=[{'name': i, 'id': i} for i in df.columns],
-                style_table={'overflowX': 'auto', 'backgroundColor': '#212529', 'color': 'white'},
-                style_header={'backgroundColor': 'black', 'color': 'white'},
-                style_data={'backgroundColor': '#343a40', 'color': 'white'},
-                page_size=10,  
-                style_cell={'textAlign': 'left', 'padding': '5px'},
-                sort_action="native",
-                filter_action="native",
-            )
-        ], className="table-responsive")
-    except Exception as e:
-        return html.Div([f'❌ Error processing file: {str(e)}'], className='text-danger')
+    return dbc.Row([
+        dbc.Col(pie_chart, xs=12, sm=6, className="p-2"),
+        dbc.Col(donut_chart, xs=12, sm=6, className="p-2")
+    ], className="container-fluid justify-content-center")
 
 # Register callbacks
 def register_callbacks(app):
@@ -85,61 +150,57 @@ def register_callbacks(app):
          Output('charts', 'children'),
          Output('processed-data-store', 'data')],  
         [Input('upload-data', 'contents')],
-        [State('upload-data', 'filename')]
+        [State('upload-data', 'filename'),
+         State('upload-mode', 'value'),
+         State('processed-data-store', 'data')]
     )
-    def update_output(contents, filename):
-        if contents is not None:
-            parsed_data = parse_contents(contents, filename)
-
-            try:
-                df = pd.read_csv(io.StringIO(base64.b64decode(contents.split(',')[1]).decode('utf-8')))
-                df = process_data(df)
-
-                if df is None or df.empty:
-                    return parsed_data, html.Div(), html.Div(), None
-            except Exception as e:
-                return html.Div([f'❌ Error reading file: {str(e)}'], className='text-danger'), html.Div(), html.Div(), None
-
-            # Generate Summary Cards
-            total_calls = len(df)
-            total_duration = int((df["Call Duration Seconds"].sum()) / 60) if "Call Duration Seconds" in df.columns else 0
-            unique_owners = df["Owner"].nunique() if "Owner" in df.columns else 0
-
-            cards = html.Div(
-                dbc.Row([
-                    dbc.Col(dbc.Card(dbc.CardBody([
-                        html.H4("Total Calls", className="card-title text-center"),
-                        html.H3(total_calls, className="values text-center")
-                    ]), style={"width": "100%"}), xs=12, sm=6, md=3, className="mb-3 p-2"),
-                    
-                    dbc.Col(dbc.Card(dbc.CardBody([
-                        html.H4("Total Duration (min)", className="card-title text-center"),
-                        html.H3(total_duration, className="values text-center")
-                    ]), style={"width": "100%"}), xs=12, sm=6, md=3, className="mb-3 p-2"),
-                    
-                    dbc.Col(dbc.Card(dbc.CardBody([
-                        html.H4("Unique Owners", className="card-title text-center"),
-                        html.H3(unique_owners, className="values text-center")
-                    ]), style={"width": "100%"}), xs=12, sm=6, md=3, className="mb-3 p-2"),
-                ], className="justify-content-center"), className="cards-section container-fluid"
-            )
-
-            # Generate Charts
-            pie_chart = dcc.Graph(
-                figure=px.pie(df, names="ActivityEvent", title="Activity Event Distribution", hole=0.3, template="plotly_dark"),
-                style={"width": "100%"}
-            )
+    def update_output(contents, filenames, mode, current):
+        if not contents:
+            return html.Div(), html.Div(), html.Div(), no_update
+
+        if not all(filename.endswith(('.csv', '.xlsx')) for filename in filenames):
+            return html.Div(['❌ Unsupported format. Upload CSV or Excel.'], className='text-danger'), html.Div(), html.Div(), None
+
+        uploads = list(zip(contents, filenames))
+        try:
+            # Decode, parse and process once; every output below is built from this result
+            derived = None
+            if mode == 'append' and current:
+                df, meta, derived = append_upload(current, uploads)
+            else:
+                # Replacing with several files: the first one starts the dataset, the rest are appended
+                df, meta = ingest_upload(*uploads[0])
+                if len(uploads) > 1:
+                    store_dataset(df, token=meta["token"])
+                    df, meta, derived = append_upload(meta["token"], uploads[1:])
+        except Exception as e:
+            # A failed append leaves the current dataset in place
+            keep = no_update if mode == 'append' else None
+            return html.Div([f'❌ Error processing file: {str(e)}'], className='text-danger'), html.Div(), html.Div(), keep
 
-            donut_chart = dcc.Graph(
-                figure=px.pie(df, names="Status", title="Status Distribution", hole=0.5, template="plotly_dark"),
-                style={"width": "100%"}
-            )
+        if df is None or df.empty:
+            return html.Div(['⚠️ Error: Processed data is empty. Check your file.'], className='text-danger'), html.Div(), html.Div(), None
 
-            charts = dbc.Row([
-                dbc.Col(pie_chart, xs=12, sm=6, className="p-2"),
-                dbc.Col(donut_chart, xs=12, sm=6, className="p-2")
-            ], className="container-fluid justify-content-center")
+        # Keep the frame server-side; the store only carries its token
+        token = store_dataset(df, token=meta["token"], derived=derived)
+        # Build the report aggregates and filter index once, at upload time
+        cube = get_cube(token)
+        get_filter_index(token)
+        return parse_contents(df, meta), summary_cards(cube), distribution_charts(df), token
 
-            return parsed_data, cards, charts, df.to_json(date_format='iso', orient='split')
+    @app.callback(
+        [Output('upload-preview-table', 'data'),
+         Output('upload-preview-table', 'page_count')],
+        [Input('upload-preview-table', 'page_current'),
+         Input('upload-preview-table', 'page_size'),
+         Input('upload-preview-table', 'sort_by'),
+         Input('upload-preview-table', 'filter_query'),
+         Input('processed-data-store', 'data')]
+    )
+    def update_preview_table(page_current, page_size, sort_by, filter_query, data):
+        df = get_dataset(data)
+        if df is None:
+            return [], 1
 
-        return html.Div(), html.Div(), html.Div(), None
+        df = query_frame(df, filter_query, sort_by)
+        return page_records(df, page_current, page_size or PREVIEW_PAGE_SIZE)
@@ -1,48 +1,64 @@
 import dash
-from dash import dcc, html
+from dash import dcc, html, ctx
 import dash_bootstrap_components as dbc
 from dash.dependencies import Input, Output, State
-import pandas as pd
-import plotly.express as px
-import tempfile
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from reportlab.lib.pagesizes import A3
-import os
-from flask import send_file
+from utils.data_processing import column_values
+from utils.dataset_cache import get_dataset
+from utils.aggregates import get_cube
+from utils.crosstab import count_by, count_matrix, COUNT_MODES, DEFAULT_COUNT_MODE, LEAD_KEY
+from utils.figure_cache import figure_cache, normalize_filters
+from utils.figure_scheduler import figure_scheduler
+from utils.pdf_export import export_outputs, export_pdf
+from utils.rendering import budget, fold_categories
+from utils.metrics import phase
+
+# Columns the filter dropdowns are built from
+FILTER_COLUMNS = ["Lead Source", "Lead Stage"]
 
 # Layout
-layout = html.Div([
-    dcc.Store(id='processed-data-store'),
-    html.H2("Source-Wise Reports", className="text-center text-white"),
+def layout():
+    return html.Div([
+        html.H2("Source-Wise Reports", className="text-center text-white"),
     
-    # Filters Section
-    dbc.Container([
-        dbc.Row([
-            dbc.Col([
-                dcc.Dropdown(id='source-source-filter', multi=True, placeholder="Select Source"),
-            ], width=4),
-            dbc.Col([
-                dcc.Dropdown(id='source-lead-stage-filter', multi=True, placeholder="Select Lead Stage"),
-            ], width=4),
-        ], className="mb-3"),
-    ]),   
+        # Filters Section
+        dbc.Container([
+            dbc.Row([
+                dbc.Col([
+                    dcc.Dropdown(id='source-source-filter', multi=True, placeholder="Select Source"),
+                ], width=4),
+                dbc.Col([
+                    dcc.Dropdown(id='source-lead-stage-filter', multi=True, placeholder="Select Lead Stage"),
+                ], width=4),
+                # Count calls or unique leads
+                dbc.Col([
+                    dbc.RadioItems(
+                        id='source-count-mode',
+                        options=[{'label': label, 'value': mode} for mode, label in COUNT_MODES.items()],
+                        value=DEFAULT_COUNT_MODE,
+                        inline=True,
+                    ),
+                ], width=4),
+            ], className="mb-3"),
+        ]),   
     
-    # Loading Component
-    dbc.Container([
-        dcc.Loading(
-            id="loading-source-reports",
-            type="circle",
-            children=[html.Div(id='source-reports-content', className="mt-3")]
-        )
-    ], className="mt-4"),
+        # Loading Component
+        dbc.Container([
+            dcc.Loading(
+                id="loading-source-reports",
+                type="circle",
+                children=[html.Div(id='source-reports-content', className="mt-3")]
+            )
+        ], className="mt-4"),
 
-    # Download PDF Button
-    dbc.Container([
-        html.Button("Download Report as PDF", id="source-download-pdf", className="btn btn-primary mt-3"),
-        dcc.Download(id="source-pdf-download-link")
-    ], className="mt-3 text-center")
-])
+        # Download PDF Button
+        dbc.Container([
+            html.Button("Download Report as PDF", id="source-download-pdf", className="btn btn-primary mt-3"),
+            dbc.Progress(id="source-pdf-progress", value=0, striped=True, animated=True, className="mt-2", style={"display": "none"}),
+            dcc.Interval(id="source-pdf-poll", interval=1000, disabled=True),
+            dcc.Store(id="source-pdf-job"),
+            dcc.Download(id="source-pdf-download-link")
+        ], className="mt-3 text-center")
+    ])
 
 # Register Callbacks
 def register_callbacks(app):
@@ -52,112 +68,110 @@ def register_callbacks(app):
         Input('processed-data-store', 'data')
     )
     def populate_filters(data):
-        if not data:
+        df = get_dataset(data, FILTER_COLUMNS)
+        if df is None:
             return [], []
         
-        df = pd.read_json(data, orient='split')
         return [
-            [{'label': source, 'value': source} for source in df['Lead Source'].dropna().unique()],
-            [{'label': stage, 'value': stage} for stage in df['Lead Stage'].dropna().unique()]
+            [{'label': source, 'value': source} for source in column_values(df, 'Lead Source')],
+            [{'label': stage, 'value': stage} for stage in column_values(df, 'Lead Stage')]
         ]
     
     @app.callback(
         Output('source-reports-content', 'children'),
         [Input('processed-data-store', 'data'),
          Input('source-source-filter', 'value'),
-         Input('source-lead-stage-filter', 'value')]
+         Input('source-lead-stage-filter', 'value'),
+         Input('source-count-mode', 'value')]
     )
-    def update_source_reports(data, selected_sources, selected_stages):
-        if not data:
+    def update_source_reports(data, selected_sources, selected_stages, mode):
+        if get_cube(data) is None:
             return html.Div("No data available. Please upload a file on the Home Page.", className='text-warning')
         
-        df = pd.read_json(data, orient='split')
-        if selected_sources:
-            df = df[df['Lead Source'].isin(selected_sources)]
-        if selected_stages:
-            df = df[df['Lead Stage'].isin(selected_stages)]
-        
-        # Pivot Table Data
-        pivot_df = df.pivot_table(index='Lead Source', columns='Lead Stage', values='Lead | Phone Number', aggfunc='count', fill_value=0)
-        lead_count = df.groupby(['Lead Source','Lead Stage']).size().reset_index(name='Lead Count')
-        
-        # Charts
-        source_heatmap = px.imshow(
-            pivot_df, color_continuous_scale="blues",
-            title="Source vs Lead Stage Heatmap", labels={'x': 'Lead Stage', 'y': 'Source', 'color': 'Lead Count'}, template="plotly_dark"
-        )
-        
-        source_bar_chart = px.bar(
-            lead_count,
-            x='Lead Source', y='Lead Count', color='Lead Stage', title="Lead Distribution by Source and Stage",
-            barmode="stack", template="plotly_dark"
-        )
-
-        source_grouped_bar_chart = px.bar(
-            lead_count, x="Lead Stage", y="Lead Count", color="Lead Source",
-            title="Lead Stage Comparison Across Sources",
-            barmode="group", template="plotly_dark"
-        )
-
-        source_sunburst_chart = px.sunburst(
-            lead_count, path=["Lead Source", "Lead Stage"], values="Lead Count",
-            title="Source Breakdown by Lead Stages",template = "plotly_dark",height=600
-        )
-        
-        source_treemap_chart = px.treemap(
-            lead_count, path=["Lead Source", "Lead Stage"], values="Lead Count",
-            title="Lead Count Distribution by Source",template = "plotly_dark",height=600
+        filters = {'Lead Source': selected_sources, 'Lead Stage': selected_stages}
+        mode = mode or DEFAULT_COUNT_MODE
+        charts = figure_cache.get_or_build(
+            (data, 'source', normalize_filters(filters), mode), lambda: build_source_figures(data, filters, mode)
         )
 
-        return html.Div([
-            dcc.Graph(figure=source_heatmap),
-            dcc.Graph(figure=source_bar_chart),
-            dcc.Graph(figure=source_grouped_bar_chart),
-            dcc.Graph(figure=source_sunburst_chart),
-            dcc.Graph(figure=source_treemap_chart)
-        ])
+        return html.Div([dcc.Graph(figure=chart) for chart in charts])
     
+    # PDF export runs as a background job; the interval polls it until the file is ready
     @app.callback(
-        Output("source-pdf-download-link", "data"),
-        Input("source-download-pdf", "n_clicks"),
-        State('processed-data-store', 'data'),
+        [Output("source-pdf-download-link", "data"),
+         Output("source-pdf-job", "data"),
+         Output("source-pdf-poll", "disabled"),
+         Output("source-pdf-progress", "value"),
+         Output("source-pdf-progress", "label"),
+         Output("source-pdf-progress", "style")],
+        [Input("source-download-pdf", "n_clicks"),
+         Input("source-pdf-poll", "n_intervals")],
+        [State('processed-data-store', 'data'),
+         State("source-pdf-job", "data")],
         prevent_initial_call=True
     )
-    def generate_pdf(n_clicks, data):
-        if not data:
-            return None
+    def generate_pdf(n_clicks, n_intervals, data, job_id):
+        start = ctx.triggered_id == "source-download-pdf"
+        token = data if get_cube(data) is not None else None
+        return export_outputs(start, token, job_id, build_source_pdf, "source_reports.pdf")
 
-        df = pd.read_json(data, orient='split')
-        lead_counts = df.groupby(['Lead Source', 'Lead Stage']).size().reset_index(name='Lead Count')
-        pivot_df = df.pivot_table(index='Lead Source', columns='Lead Stage', values='Lead | Phone Number', aggfunc='count', fill_value=0)
+# Build the export charts and render them to PDF; runs on the job queue
+def build_source_pdf(job, token):
+    import plotly.express as px
 
-        # Generate Charts
-        charts = {
-            "Heatmap": px.imshow(pivot_df, color_continuous_scale="viridis", title="Lead Stage Distribution Heatmap by Source"),
-            "Stacked Bar Chart": px.bar(lead_counts, x='Lead Source', y='Lead Count', color='Lead Stage', barmode='stack', title="Source-Wise Lead Distribution"),
-            "Grouped Bar Chart": px.bar(lead_counts, x="Lead Stage", y="Lead Count", color="Lead Source", barmode='group', title="Lead Stage Comparison Across Sources"),
-            "Sunburst Chart": px.sunburst(lead_counts, path=["Lead Source", "Lead Stage"], values="Lead Count", title="Source Breakdown by Lead Stages"),
-            "Treemap Chart": px.treemap(lead_counts, path=["Lead Source", "Lead Stage"], values="Lead Count", title="Lead Count Distribution by Source")
-        }
+    lead_counts = get_cube(token).query(['Lead Source', 'Lead Stage'])
+    # Phone numbers recorded per source and stage, straight from the category codes
+    pivot_df = count_matrix(token, 'Lead Source', 'Lead Stage', notna=LEAD_KEY)
+    lead_counts = lead_counts.rename(columns={'Count': 'Lead Count'})
 
-        temp_dir = tempfile.gettempdir()
-        pdf_path = os.path.join(temp_dir, "source_reports.pdf")
-        c = canvas.Canvas(pdf_path, pagesize=A3)
-        page_width, page_height = A3
-        y_position = page_height - 100
-        chart_width, chart_height = 700, 500
+    # Generate Charts
+    charts = {
+        "Heatmap": px.imshow(pivot_df, color_continuous_scale="viridis", title="Lead Stage Distribution Heatmap by Source"),
+        "Stacked Bar Chart": px.bar(lead_counts, x='Lead Source', y='Lead Count', color='Lead Stage', barmode='stack', title="Source-Wise Lead Distribution"),
+        "Grouped Bar Chart": px.bar(lead_counts, x="Lead Stage", y="Lead Count", color="Lead Source", barmode='group', title="Lead Stage Comparison Across Sources"),
+        "Sunburst Chart": px.sunburst(lead_counts, path=["Lead Source", "Lead Stage"], values="Lead Count", title="Source Breakdown by Lead Stages"),
+        "Treemap Chart": px.treemap(lead_counts, path=["Lead Source", "Lead Stage"], values="Lead Count", title="Lead Count Distribution by Source")
+    }
 
-        for chart_name, fig in charts.items():
-            chart_path = os.path.join(temp_dir, f"{chart_name}.png")
-            fig.write_image(chart_path, format='png')
-            x_center = (page_width - chart_width) / 2
-            c.setFont("Helvetica-Bold", 18)
-            c.drawString(x_center + 50, y_position + 20, chart_name)
-            c.drawImage(ImageReader(chart_path), x_center, y_position - chart_height, width=chart_width, height=chart_height)
-            y_position -= (chart_height + 70)
-            if y_position < 100:
-                c.showPage()
-                y_position = page_height - 100
-        
-        c.save()
-        return dcc.send_file(pdf_path)
+    return export_pdf(job, list(charts.values()), titles=list(charts), width=700, height=500, gap=70)
+
+# Build the on-screen charts for one filter state
+def build_source_figures(token, filters, mode=DEFAULT_COUNT_MODE):
+    import plotly.express as px
+
+    with phase("aggregate"):
+        lead_count = count_by(token, ['Lead Source', 'Lead Stage'], filters, mode).rename(columns={'Count': 'Lead Count'})
+
+        # Pivot Table Data (phone numbers recorded per cell, or distinct ones in the lead modes)
+        pivot_df = count_matrix(token, 'Lead Source', 'Lead Stage', filters, mode, notna=LEAD_KEY)
+        # Sources beyond the budget are combined into "Other" in the bar charts
+        source_bars = fold_categories(lead_count, 'Lead Source', ['Lead Count'], budget('source-bars', 'categories'), by=['Lead Stage'])
+
+    with phase("figures"):
+        # Charts, built and serialized concurrently on the figure pool
+        charts = figure_scheduler.build([
+            lambda: px.imshow(
+                pivot_df, color_continuous_scale="blues",
+                title="Source vs Lead Stage Heatmap", labels={'x': 'Lead Stage', 'y': 'Source', 'color': 'Lead Count'}, template="plotly_dark"
+            ),
+            lambda: px.bar(
+                source_bars,
+                x='Lead Source', y='Lead Count', color='Lead Stage', title="Lead Distribution by Source and Stage",
+                barmode="stack", template="plotly_dark"
+            ),
+            lambda: px.bar(
+                source_bars, x="Lead Stage", y="Lead Count", color="Lead Source",
+                title="Lead Stage Comparison Across Sources",
+                barmode="group", template="plotly_dark"
+            ),
+            lambda: px.sunburst(
+                lead_count, path=["Lead Source", "Lead Stage"], values="Lead Count",
+                title="Source Breakdown by Lead Stages",template = "plotly_dark",height=600
+            ),
+            lambda: px.treemap(
+                lead_count, path=["Lead Source", "Lead Stage"], values="Lead Count",
+                title="Lead Count Distribution by Source",template = "plotly_dark",height=600
+            ),
+        ], serialize=True)
+
+    return charts
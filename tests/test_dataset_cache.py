@@ -0,0 +1,27 @@
+import pandas as pd
+
+from utils.dataset_cache import DatasetRegistry
+
+
+class Growing:
+    """ Derived structure that caches results as it is used """
+
+    def __init__(self):
+        self.nbytes = 100
+
+
+def test_growth_of_a_derived_structure_counts_toward_the_budget():
+    registry = DatasetRegistry(max_items=10, ttl_seconds=3600, max_bytes=10_000)
+    df = pd.DataFrame({"a": range(10)})
+    first, second = registry.put(df), registry.put(df)
+    structure = registry.get_derived(second, "cube", lambda df: Growing())
+    before = registry.stats()["bytes"]
+
+    structure.nbytes = 5_000
+    assert registry.get_derived(second, "cube", lambda df: Growing()) is structure
+    assert registry.stats()["bytes"] == before + 4_900
+
+    structure.nbytes = 20_000
+    registry.get_derived(second, "cube", lambda df: Growing())
+    assert registry.get(first) is None
+    assert registry.stats() == {"items": 1, "bytes": before + 19_900 - int(df.memory_usage(deep=True).sum())}
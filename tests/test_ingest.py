@@ -0,0 +1,49 @@
+import base64
+import os
+
+import pandas as pd
+import pytest
+
+import config
+from benchmarks.synthetic import make_call_log
+from utils.ingest import persist, read_upload
+
+
+@pytest.fixture(autouse=True)
+def data_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setattr(config, "SHARED_DIR", "")
+
+
+def mixed_upload():
+    """ 3000-row CSV upload whose phone numbers are all digits except one "not given" in the last 1000 rows """
+    raw = make_call_log(3000)
+    raw.loc[2500, "Lead | Phone Number"] = "not given"
+    return "data:text/csv;base64," + base64.b64encode(raw.to_csv(index=False).encode()).decode()
+
+
+def test_mixed_dtype_upload_is_processed_and_kept():
+    df = read_upload(mixed_upload(), "calls.csv", chunk_rows=1000)
+    assert persist("a" * 32, df) is df
+    assert len(df) == 3000
+
+
+def test_failed_snapshot_keeps_the_frame_in_memory_and_cleans_up(monkeypatch):
+    def partial_write(df, path, **kwargs):
+        with open(path, "wb") as f:
+            f.write(b"PAR1")
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(pd.DataFrame, "to_parquet", partial_write)
+    df = read_upload(mixed_upload(), "calls.csv", chunk_rows=1000)
+    assert persist("b" * 32, df) is df
+    assert os.listdir(config.DATA_DIR) == []
+
+
+def test_chunked_read_matches_a_single_read():
+    contents = mixed_upload()
+    chunked = read_upload(contents, "calls.csv", chunk_rows=1000)
+    single = read_upload(contents, "calls.csv", chunk_rows=10_000)
+    # Categories are the union in chunk order rather than sorted; the values are the same
+    pd.testing.assert_frame_equal(chunked, single, check_categorical=False)
+    assert chunked["Lead | Phone Number"].map(type).eq(str).all()
@@ -0,0 +1,14 @@
+import json
+import time
+
+from utils.owner_groups import OwnerGroups
+
+
+def test_first_call_loads_the_mapping_however_long_the_poll_interval(tmp_path):
+    path = tmp_path / "owner_groups.json"
+    path.write_text(json.dumps({"TL1": ["Asha"]}))
+    # Longer than the host has been up, so time.monotonic() is still below it
+    groups = OwnerGroups(str(path), poll_seconds=time.monotonic() + 3600)
+    mapping, version = groups.current()
+    assert mapping == {"Asha": "TL1"}
+    assert version is not None
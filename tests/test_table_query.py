@@ -0,0 +1,20 @@
+import pandas as pd
+
+from utils.table_query import query_frame, split_filter_part
+
+
+def test_operator_is_read_after_the_column_name():
+    assert split_filter_part('{Lead Source} = "Google Ads"') == ('Lead Source', 'eq', 'Google Ads')
+    assert split_filter_part('{Lead Source} contains Google Ads') == ('Lead Source', 'contains', 'Google Ads')
+    assert split_filter_part('{Lead | Phone Number} ne 123') == ('Lead | Phone Number', 'ne', 123.0)
+    assert split_filter_part('{Call Duration Seconds} >= 60') == ('Call Duration Seconds', 'ge', 60.0)
+
+
+def test_braces_in_the_value_do_not_move_the_column_name():
+    assert split_filter_part('{Owner} eq "a}b"') == ('Owner', 'eq', 'a}b')
+
+
+def test_query_frame_matches_values_containing_operator_words():
+    df = pd.DataFrame({'Lead Source': pd.Categorical(['Google Ads', 'Facebook', 'Google Ads', 'Website'])})
+    assert len(query_frame(df, '{Lead Source} = "Google Ads"')) == 2
+    assert len(query_frame(df, '{Lead Source} contains Google Ads')) == 2
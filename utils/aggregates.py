@@ -0,0 +1,134 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import config
+from utils.data_processing import align_categories
+from utils.dataset_cache import registry
+from utils.owner_groups import assign_groups
+
+# Low-cardinality columns the report pages group or filter by
+CUBE_DIMENSIONS = [
+    "Owner", "Group", "Lead Stage", "Lead Source", "Lead | Course",
+    "Lead | Permanent District", "ActivityEvent",
+]
+
+# Measures kept per cell; all of them roll up by summing
+CUBE_MEASURES = ["Count", "Duration", "Status Count", "Phone Count"]
+
+# Raw columns the cube is built from
+CUBE_COLUMNS = CUBE_DIMENSIONS + ["Call Duration Seconds", "Status", "Lead | Phone Number"]
+
+
+class AggregateCube:
+    """ Count/duration cube over `CUBE_DIMENSIONS`, built once per dataset.
+
+    `query` answers a filtered group-by by rolling up cube cells instead of
+    rescanning raw rows. Roll-ups to a subset of dimensions are cached, and
+    each one is built from the smallest cached cube that covers it; the
+    least recently used are dropped beyond ROLLUP_CACHE_MAX_BYTES.
+    """
+
+    def __init__(self, cells, dimensions):
+        self.dimensions = list(dimensions)
+        self._cells = cells
+        self._cells_bytes = int(cells.memory_usage(deep=True).sum())
+        self._views = OrderedDict()  # frozenset(dimensions) -> (roll-up, nbytes), least recently used first
+        self._views_bytes = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df, dimensions=CUBE_DIMENSIONS):
+        dimensions = [dim for dim in dimensions if dim in df.columns]
+        measures = pd.DataFrame({
+            "Count": np.ones(len(df), dtype=np.int64),
+            "Duration": df["Call Duration Seconds"].astype("float64") if "Call Duration Seconds" in df.columns else np.nan,
+            "Status Count": df["Status"].notna().astype(np.int64) if "Status" in df.columns else 0,
+            "Phone Count": df["Lead | Phone Number"].notna().astype(np.int64) if "Lead | Phone Number" in df.columns else 0,
+        }, index=df.index)
+        keys = [df[dim] for dim in dimensions]
+        cells = measures.groupby(keys, observed=True, dropna=False, sort=False).sum(min_count=0).reset_index()
+        return cls(cells, dimensions)
+
+    def merge(self, other):
+        """ Cube over the rows of both cubes, e.g. a dataset plus rows appended to it """
+        dimensions = [dim for dim in self.dimensions if dim in other.dimensions]
+        cells = pd.concat(align_categories([self.view(dimensions), other.view(dimensions)]), ignore_index=True)
+        if dimensions:
+            cells = cells.groupby(dimensions, observed=True, dropna=False, sort=False)[CUBE_MEASURES].sum().reset_index()
+        else:
+            cells = cells[CUBE_MEASURES].sum().to_frame().T
+        return AggregateCube(cells, dimensions)
+
+    def regroup(self):
+        """ Cube with Group recomputed from Owner under the current mapping (None if it can't be) """
+        if "Group" not in self.dimensions:
+            return self
+        if "Owner" not in self.dimensions:
+            return None
+        # Owner determines Group, so the cells stay distinct; only the Group column changes
+        cells = self.cells.copy(deep=False)
+        cells["Group"] = assign_groups(cells["Owner"])
+        return AggregateCube(cells, self.dimensions)
+
+    @property
+    def cells(self):
+        return self._cells
+
+    @property
+    def nbytes(self):
+        return self._cells_bytes + self._views_bytes
+
+    def view(self, dimensions):
+        """ Cube rolled up to `dimensions` (missing keys are kept as their own cells) """
+        key = frozenset(dimensions)
+        if key == frozenset(self.dimensions):
+            return self._cells
+        with self._lock:
+            cached = self._views.get(key)
+            if cached is not None:
+                self._views.move_to_end(key)
+                return cached[0]
+            covering = [view for k, (view, _) in self._views.items() if key <= k]
+
+        source = min([self._cells, *covering], key=len)
+        dims = [dim for dim in self.dimensions if dim in key]
+        if dims:
+            view = source.groupby(dims, observed=True, dropna=False, sort=False)[CUBE_MEASURES].sum().reset_index()
+        else:
+            view = source[CUBE_MEASURES].sum().to_frame().T
+
+        with self._lock:
+            if key not in self._views:
+                nbytes = int(view.memory_usage(deep=True).sum())
+                self._views[key] = (view, nbytes)
+                self._views_bytes += nbytes
+                while self._views and self._views_bytes > config.ROLLUP_CACHE_MAX_BYTES:
+                    _, (_, evicted_bytes) = self._views.popitem(last=False)
+                    self._views_bytes -= evicted_bytes
+        return view
+
+    def query(self, group_by, filters=None):
+        """ Filtered group-by totals, like `df[filters].groupby(group_by).sum()` on the raw rows """
+        filters = {col: values for col, values in (filters or {}).items() if values}
+        view = self.view(set(group_by) | set(filters))
+
+        if filters:
+            mask = np.ones(len(view), dtype=bool)
+            for col, values in filters.items():
+                mask &= view[col].isin(values).to_numpy()
+            view = view[mask]
+
+        result = view.groupby(list(group_by), observed=True)[CUBE_MEASURES].sum().reset_index()
+        # Keep only the categories present so pivots and legends match a raw-row group-by
+        for col in group_by:
+            if isinstance(result[col].dtype, pd.CategoricalDtype):
+                result[col] = result[col].cat.remove_unused_categories()
+        return result
+
+
+def get_cube(token):
+    """ Aggregate cube for a cached dataset, built on first use """
+    return registry.get_derived(token, "cube", AggregateCube.from_frame, columns=CUBE_COLUMNS)
@@ -0,0 +1,246 @@
+import copy
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import config
+from utils.aggregates import get_cube
+from utils.dataset_cache import registry
+from utils.filter_index import get_filter_index
+from utils.hll import HyperLogLog, hash_values
+from utils.owner_groups import assign_groups
+
+# Columns the report pages cross-tabulate
+CROSSTAB_DIMENSIONS = [
+    "Owner", "Group", "Lead Stage", "Lead Source", "Lead | Course",
+    "Lead | Permanent District", "ActivityEvent",
+]
+
+# A lead is identified by its phone number
+LEAD_KEY = "Lead | Phone Number"
+
+# Raw columns the cross-tab engine is built from
+CROSSTAB_COLUMNS = CROSSTAB_DIMENSIONS + [LEAD_KEY]
+
+# What the report charts count: call rows, or distinct leads (exact, or HyperLogLog estimates)
+COUNT_MODES = {"calls": "Calls", "leads": "Unique leads", "leads_hll": "Unique leads (approx.)"}
+DEFAULT_COUNT_MODE = "calls"
+
+
+class CrossTab:
+    """ Dense count matrices over the report columns, built from category codes.
+
+    Every column is reduced once to integer codes plus its labels, and the
+    phone numbers to lead codes. A matrix is one `np.bincount` over
+    `row code * number of columns + column code` for the selected rows,
+    instead of a group-by and pivot on the raw rows; unfiltered results are
+    cached, up to ROLLUP_CACHE_MAX_BYTES. Distinct leads per cell are counted
+    exactly from the distinct (cell, lead code) pairs, or estimated with a
+    HyperLogLog sketch per cell when more than DISTINCT_EXACT_MAX_ROWS rows
+    are selected.
+    """
+
+    def __init__(self, df, columns=CROSSTAB_DIMENSIONS):
+        self.n_rows = len(df)
+        self._codes = {}
+        self._labels = {}
+        for col in columns:
+            if col in df.columns:
+                self._codes[col], self._labels[col] = _codes(df[col])
+        if LEAD_KEY in df.columns:
+            self._lead_hashes, lead_codes = hash_values(df[LEAD_KEY])
+            self._lead_codes = lead_codes.astype(np.int32)
+        else:
+            self._lead_hashes, self._lead_codes = np.zeros(0, dtype=np.uint64), np.full(len(df), -1, dtype=np.int32)
+        self._reset_matrices()
+
+    def _reset_matrices(self):
+        self._matrices = OrderedDict()  # key -> (result, nbytes), least recently used first
+        self._matrices_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        arrays = [*self._codes.values(), self._lead_codes, self._lead_hashes]
+        return int(sum(array.nbytes for array in arrays)) + self._matrices_bytes
+
+    def regroup(self):
+        """ Cross-tab with the Group codes recomputed from the Owner codes under the current mapping """
+        if "Group" not in self._codes:
+            return self
+        if "Owner" not in self._codes:
+            return None
+        owners = pd.Series(pd.Categorical.from_codes(self._codes["Owner"], self._labels["Owner"]))
+        crosstab = copy.copy(self)
+        crosstab._codes, crosstab._labels = dict(self._codes), dict(self._labels)
+        crosstab._codes["Group"], crosstab._labels["Group"] = _codes(assign_groups(owners))
+        crosstab._reset_matrices()
+        return crosstab
+
+    def counts(self, index, columns=None, rows=None, notna=None):
+        """ Rows per (`index`, `columns`) cell as a DataFrame, or per `index` value as a Series.
+
+        `rows` are the positions selected by the filters (None for every
+        row). With `notna`, only rows where that column (e.g. LEAD_KEY) is
+        present are counted, like `pivot_table(..., aggfunc='count')`.
+        Rows missing either key are left out, and so are empty rows/columns.
+        """
+        return self._cached(("counts", index, columns, notna), rows, lambda: self._counts(index, columns, rows, notna))
+
+    def distinct(self, index, columns=None, rows=None, method=None):
+        """ Distinct leads (phone numbers) per cell, shaped like `counts`.
+
+        `method` is "exact", "hll", or None to count exactly up to
+        DISTINCT_EXACT_MAX_ROWS selected rows and estimate above that.
+        """
+        method = self._method(rows, method)
+        return self._cached(("distinct", index, columns, method), rows, lambda: self._distinct(index, columns, rows, method))
+
+    def leads(self, group_by, rows=None, method=None):
+        """ Distinct leads per `group_by` combination, as a frame of the `group_by` columns plus "Leads".
+
+        Like `distinct`, over any number of columns; only combinations with
+        at least one lead are returned.
+        """
+        method = self._method(rows, method)
+        return self._cached(("leads", tuple(group_by), method), rows, lambda: self._leads(group_by, rows, method))
+
+    def _method(self, rows, method):
+        selected = self.n_rows if rows is None else len(rows)
+        return method or ("exact" if selected <= config.DISTINCT_EXACT_MAX_ROWS else "hll")
+
+    def _cached(self, key, rows, build):
+        if rows is not None:
+            return build()
+        with self._lock:
+            cached = self._matrices.get(key)
+            if cached is not None:
+                self._matrices.move_to_end(key)
+                return cached[0]
+
+        result = build()
+        nbytes = result.memory_usage(deep=True)
+        nbytes = int(nbytes.sum() if isinstance(result, pd.DataFrame) else nbytes)
+        with self._lock:
+            if key not in self._matrices:
+                self._matrices[key] = (result, nbytes)
+                self._matrices_bytes += nbytes
+                while self._matrices and self._matrices_bytes > config.ROLLUP_CACHE_MAX_BYTES:
+                    _, (_, evicted_bytes) = self._matrices.popitem(last=False)
+                    self._matrices_bytes -= evicted_bytes
+        return result
+
+    def _cells(self, dimensions, rows, keep=None):
+        """ (cell number of each kept row, mask of the kept rows, shape) for the selected rows """
+        shape = tuple(len(self._labels[dim]) for dim in dimensions)
+        n = self.n_rows if rows is None else len(rows)
+        mask = np.ones(n, dtype=bool) if keep is None else keep
+        codes = []
+        for dim in dimensions:
+            dim_codes = self._codes[dim] if rows is None else self._codes[dim][rows]
+            mask = mask & (dim_codes >= 0)
+            codes.append(dim_codes)
+        cells = np.zeros(int(mask.sum()), dtype=np.int64)
+        for dim_codes, size in zip(codes, shape):
+            cells = cells * size + dim_codes[mask]
+        return cells, mask, shape
+
+    def _counts(self, index, columns, rows, notna):
+        keep = None
+        if notna is not None:
+            codes = self._lead_codes if notna == LEAD_KEY else self._codes[notna]
+            keep = (codes if rows is None else codes[rows]) >= 0
+        cells, _, shape = self._cells(_dimensions(index, columns), rows, keep)
+        totals = np.bincount(cells, minlength=int(np.prod(shape)))
+        return self._matrix(totals, index, columns, shape)
+
+    def _distinct(self, index, columns, rows, method):
+        totals, shape = self._distinct_totals(_dimensions(index, columns), rows, method)
+        return self._matrix(totals, index, columns, shape)
+
+    def _leads(self, group_by, rows, method):
+        totals, shape = self._distinct_totals(group_by, rows, method)
+        cells = np.flatnonzero(totals)
+        # Only the labels present, so legends match a group-by on the raw rows
+        frame = {
+            dim: pd.Categorical.from_codes(codes, self._labels[dim]).remove_unused_categories()
+            for dim, codes in zip(group_by, np.unravel_index(cells, shape))
+        }
+        return pd.DataFrame({**frame, "Leads": totals[cells]})
+
+    def _distinct_totals(self, dimensions, rows, method):
+        """ (distinct leads per cell, shape) over `dimensions` for the selected rows """
+        leads = self._lead_codes if rows is None else self._lead_codes[rows]
+        cells, mask, shape = self._cells(dimensions, rows, leads >= 0)
+        leads = leads[mask]
+        totals = np.zeros(int(np.prod(shape)), dtype=np.int64)
+        if method == "hll":
+            # One sketch per occupied cell only, so memory follows the cells in use
+            occupied, sketch_ids = np.unique(cells, return_inverse=True)
+            sketches = HyperLogLog(len(occupied))
+            sketches.add(sketch_ids, self._lead_hashes[leads])
+            totals[occupied] = np.maximum(np.rint(sketches.count()), 1)
+        else:
+            # Each distinct (cell, lead) pair counts once for its cell
+            n_leads = max(len(self._lead_hashes), 1)
+            pairs = pd.unique(cells * n_leads + leads)
+            totals += np.bincount(pairs // n_leads, minlength=len(totals))
+        return totals, shape
+
+    def _matrix(self, totals, index, columns, shape):
+        index_labels = pd.Index(self._labels[index], name=index)
+        if columns is None:
+            series = pd.Series(totals, index=index_labels)
+            return series[series > 0]
+        matrix = pd.DataFrame(
+            totals.reshape(shape), index=index_labels, columns=pd.Index(self._labels[columns], name=columns)
+        )
+        return matrix.loc[matrix.sum(axis=1) > 0, matrix.sum(axis=0) > 0]
+
+
+def _dimensions(index, columns):
+    return [index] if columns is None else [index, columns]
+
+
+def _codes(series):
+    """ (integer codes, labels) of a column; missing values get code -1 """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes, labels = series.cat.codes.to_numpy(), series.cat.categories
+    else:
+        codes, labels = pd.factorize(series, sort=True)
+    # Keep the codes as small as the number of labels allows
+    return codes.astype(np.min_scalar_type(-len(labels) - 1)), pd.Index(labels)
+
+
+def get_crosstab(token):
+    """ Cross-tab engine for a cached dataset, built on first use """
+    return registry.get_derived(token, "crosstab", CrossTab, columns=CROSSTAB_COLUMNS)
+
+
+def count_by(token, group_by, filters=None, mode=DEFAULT_COUNT_MODE):
+    """ "Count" per `group_by` combination under `filters`, in one of COUNT_MODES.
+
+    Calls are rolled up from the aggregate cube; leads are counted from the
+    cross-tab for the rows the filter index selects. Either way the result
+    has the `group_by` columns plus "Count", like `AggregateCube.query`.
+    """
+    if mode in (None, "calls"):
+        return get_cube(token).query(group_by, filters)[list(group_by) + ["Count"]]
+    rows = get_filter_index(token).rows(filters or {})
+    return get_crosstab(token).leads(group_by, rows, _method(mode)).rename(columns={"Leads": "Count"})
+
+
+def count_matrix(token, index, columns, filters=None, mode=DEFAULT_COUNT_MODE, notna=None):
+    """ `index` x `columns` matrix under `filters` in one of COUNT_MODES (`notna` applies to calls) """
+    crosstab = get_crosstab(token)
+    rows = get_filter_index(token).rows(filters or {})
+    if mode in (None, "calls"):
+        return crosstab.counts(index, columns, rows, notna)
+    return crosstab.distinct(index, columns, rows, _method(mode))
+
+
+def _method(mode):
+    """ Distinct-count method for a lead mode; plain "leads" is exact unless the selection is very large """
+    return "hll" if mode == "leads_hll" else None
@@ -2,52 +2,138 @@ import pandas as pd
 import numpy as np
 import re
 
-def process_data(df):
-    OWNER_GROUP_MAPPING = {
-        "Timir Chakraborty": "Admin", "Jhuma Roy Chowdhury": "Admin", "Nilanjan Bhattacherjee": "Admin",
-        "Barnali Bhattacherjee": "Admin", "Twinkle Barua": "Admin", "Surajit Mukherjee": "Admin",
-        "Paritosh Debbarma": "Admin", "Group Leader": "Admin", "Harendranath Ghosh": "Admin",
-        "Admin ": "Admin", "Edutrack": "Admin",
-        
-        "Telecaller 3": "ATL1", "Telecaller 4": "ATL1", "Telecaller 15": "ATL1", "Telecaller 16": "ATL1",
-        "Telecaller 17": "ATL1", "Telecaller 22": "ATL1", "Telecaller 25": "ATL1", "Telecaller 27": "ATL1",
-        "Telecaller 28": "ATL1", "Telecaller 49": "ATL1", "Telecaller 63": "ATL1", "Telecaller 65": "ATL1",
-        
-        "Telecaller 1": "TL1", "Telecaller 12": "TL1", "Telecaller 19": "TL1", "Telecaller 21": "TL1",
-        "Telecaller 26": "TL1", "Telecaller 41": "TL1", "Telecaller 48": "TL1", "Telecaller 53": "TL1",
-        "Telecaller 55": "TL1", "Telecaller 56": "TL1", "Telecaller 60": "TL1", "Telecaller 62": "TL1",
-        "Telecaller 64": "TL1", "Telecaller 66": "TL1", "TCE Mousumi": "TL1",
-
-        "Telecaller 5": "TL2", "Telecaller 6": "TL2", "Telecaller 7": "TL2", "Telecaller 13": "TL2",
-        "Telecaller 23": "TL2", "Telecaller 45": "TL2", "Telecaller 46": "TL2", "Telecaller 50": "TL2",
-        "Telecaller 51": "TL2", "Telecaller 52": "TL2", "Telecaller 54": "TL2", "Telecaller 57": "TL2",
-        "Telecaller 58": "TL2", "Telecaller 59": "TL2", "Telecaller 67": "TL2"
-    }
+from utils.owner_groups import assign_groups, UNKNOWN_GROUP
+
+def process_data(df, compact=False):
     try:
-        # Ensure "Owner" column exists before mapping
+        # Ensure "Owner" column exists before mapping (see utils/owner_groups.py for the mapping)
         if "Owner" in df.columns:
-            df["Group"] = df["Owner"].map(OWNER_GROUP_MAPPING).fillna("Unknown")
+            df["Group"] = assign_groups(df["Owner"])
         else:
-            df["Group"] = "Unknown"
+            df["Group"] = UNKNOWN_GROUP
 
         # Ensure "Call Duration" column exists before conversion
         if "Call Duration" in df.columns:
-            df["Call Duration Seconds"] = df["Call Duration"].apply(lambda x: convert_duration_to_seconds(str(x)) if pd.notna(x) else np.nan)
+            df["Call Duration Seconds"] = convert_durations_to_seconds(df["Call Duration"])
         else:
             df["Call Duration Seconds"] = np.nan  # If missing, fill with NaN
 
+        if compact:
+            df = compact_dtypes(df)
+
         return df  # Return the processed DataFrame
     except Exception as e:
         print(f"Error in process_data: {e}")  # Debugging
         return df  # Return original df to prevent crashes
-    
-    # Convert Call Duration to seconds
+
+
+# Low-cardinality text columns stored as pandas categoricals by compact_dtypes
+CATEGORICAL_COLUMNS = [
+    "Owner", "Group", "Lead Stage", "Lead Source", "Status", "ActivityEvent",
+    "Lead | Course", "Lead | Permanent District",
+]
+
+def compact_dtypes(df):
+    """ Shrink a processed frame for caching and fast group-bys.
+
+    Repetitive text columns become categoricals, `Call Duration Seconds` is
+    downcast and `CreatedOn` is parsed to datetime once. Memory before and
+    after (in bytes) is recorded in `df.attrs["memory_usage"]`.
+    """
+    before = int(df.memory_usage(deep=True).sum())
+
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+
+    if "Call Duration Seconds" in df.columns:
+        df["Call Duration Seconds"] = downcast_seconds(df["Call Duration Seconds"])
+
+    if "CreatedOn" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["CreatedOn"]):
+        df["CreatedOn"] = pd.to_datetime(df["CreatedOn"], errors="coerce")
+
+    df.attrs["memory_usage"] = {"before": before, "after": int(df.memory_usage(deep=True).sum())}
+    return df
+
+def downcast_seconds(seconds):
+    # Whole seconds fit an unsigned int unless values are missing; float32 is exact below ~194 days
+    seconds = pd.to_numeric(seconds, errors="coerce")
+    if seconds.isna().any():
+        return seconds.astype(np.float32)
+    return pd.to_numeric(seconds, downcast="unsigned") if (seconds >= 0).all() else pd.to_numeric(seconds, downcast="integer")
+
+def align_categories(frames):
+    """ Frames whose shared categorical columns use the union of their categories.
+
+    `pd.concat` falls back to object dtype when categories differ, so align
+    them first. The input frames are left untouched.
+    """
+    frames = list(frames)
+    categories = {}
+    for df in frames:
+        for col in df.columns:
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                categories.setdefault(col, []).append(df[col].cat.categories.astype(object))
+    # Only columns that are categorical in every frame that has them
+    categories = {
+        col: pd.unique(np.concatenate(parts)) for col, parts in categories.items()
+        if len(parts) > 1 and len(parts) == sum(col in df.columns for df in frames)
+    }
+    if not categories:
+        return frames
+
+    aligned = []
+    for df in frames:
+        df = df.copy(deep=False)
+        for col, values in categories.items():
+            if col in df.columns:
+                df[col] = df[col].cat.set_categories(values)
+        aligned.append(df)
+    return aligned
+
+def column_values(df, col):
+    """ Distinct non-null values of a column, read from the category table when possible """
+    if col not in df.columns:
+        return []
+    series = df[col]
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = np.unique(series.cat.codes.to_numpy())
+        return series.cat.categories.take(codes[codes >= 0]).tolist()
+    return series.dropna().unique().tolist()
+
+def format_bytes(nbytes):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(nbytes) < 1024 or unit == "GB":
+            return f"{nbytes:.1f} {unit}"
+        nbytes /= 1024
+
+# Matches durations like "0h:1m:35s" or "1h:20s"; every part is optional
+DURATION_PATTERN = re.compile(r'(?:(\d+)h:)?(?:(\d+)m:)?(?:(\d+)s)?')
+
+def convert_durations_to_seconds(durations):
+    """ Batched convert_duration_to_seconds for a whole Series.
+
+    Each distinct duration string is parsed once and the results are mapped
+    back to the rows, so the cost scales with the number of unique values.
+    Missing values stay NaN.
+    """
+    codes, uniques = pd.factorize(durations)
+    parts = pd.Series(pd.Index(uniques).astype(str)).str.extract('^' + DURATION_PATTERN.pattern)
+    parts = parts.astype(float).fillna(0).to_numpy()
+    unique_seconds = parts[:, 0] * 3600 + parts[:, 1] * 60 + parts[:, 2]
+
+    seconds = np.full(len(codes), np.nan)
+    present = codes >= 0
+    seconds[present] = unique_seconds[codes[present]]
+    if not np.isnan(seconds).any():
+        seconds = seconds.astype(np.int64)
+    return pd.Series(seconds, index=durations.index)
 
 def convert_duration_to_seconds(duration):
     try:
         # Extract numbers using regex (handles cases like "0h:1m:35s" or "1h:20s")
         h, m, s = 0, 0, 0
-        match = re.match(r'(?:(\d+)h:)?(?:(\d+)m:)?(?:(\d+)s)?', duration)
+        match = DURATION_PATTERN.match(duration)
         if match:
             h = int(match.group(1) or 0)
             m = int(match.group(2) or 0)
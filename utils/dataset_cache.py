@@ -0,0 +1,250 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import pandas as pd
+
+import config
+from utils.owner_groups import assign_groups, groups_version
+from utils.snapshots import load_snapshot
+
+
+class _Entry:
+    __slots__ = ("df", "nbytes", "last_access", "derived", "derived_bytes", "complete", "revision")
+
+    def __init__(self, df, nbytes, complete=True, revision=None):
+        self.df = df
+        self.nbytes = nbytes
+        self.last_access = time.monotonic()
+        self.derived = {}
+        self.derived_bytes = {}  # size of each derived structure as counted in `nbytes`
+        self.complete = complete  # False when only some columns were loaded
+        self.revision = revision
+
+    def has_columns(self, columns):
+        if columns is None:
+            return self.complete
+        return self.complete or all(col in self.df.columns for col in columns)
+
+
+class DatasetRegistry:
+    """ In-memory registry of processed DataFrames keyed by upload token.
+
+    Entries are evicted least-recently-used first once the item count or the
+    byte budget is exceeded, and expire after `ttl_seconds` without access.
+    The most recent entry is always kept, even if it alone exceeds the budget.
+
+    `loader(token, columns)`, if given, is used to (re)load datasets that are
+    not in memory, e.g. after a restart; with `columns` only those are read
+    and the rest are loaded when first asked for.
+
+    `revision()` and `refresh(df, derived)` keep entries in step with inputs
+    other than the upload (the owner -> group mapping): an entry built under
+    an older revision is passed through `refresh` on its next access.
+    """
+
+    def __init__(self, max_items, ttl_seconds, max_bytes, loader=None, revision=None, refresh=None):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.loader = loader
+        self.revision = revision
+        self.refresh = refresh
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+
+    def put(self, df, token=None, complete=True):
+        token = token or uuid.uuid4().hex
+        revision = self.revision() if self.revision else None
+        entry = _Entry(df, int(df.memory_usage(deep=True).sum()), complete, revision)
+        with self._lock:
+            self._pop(token)
+            self._entries[token] = entry
+            self._total_bytes += entry.nbytes
+            self._evict()
+        return token
+
+    def get(self, token, columns=None):
+        """ Frame for a token holding at least `columns` (every column if None); None if unknown """
+        if not token:
+            return None
+        revision = self.revision() if self.revision else None
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(token)
+            if entry is not None:
+                entry.last_access = time.monotonic()
+                self._entries.move_to_end(token)
+                if entry.revision != revision and self.refresh:
+                    entry.df, entry.derived = self.refresh(entry.df, entry.derived)
+                    entry.revision = revision
+                    for name in list(entry.derived_bytes):
+                        self._count_derived(entry, name)
+                if entry.has_columns(columns) or self.loader is None:
+                    return entry.df
+        if self.loader is None:
+            return None
+
+        present = entry.df.columns if entry is not None else ()
+        wanted = None if columns is None else [col for col in columns if col not in present]
+        loaded = self.loader(token, wanted)
+        if loaded is None:
+            return entry.df if entry is not None else None
+
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.put(loaded, token, complete=columns is None)
+                return loaded
+
+            extra = [loaded[col] for col in loaded.columns if col not in entry.df.columns]
+            if extra:
+                # copy=False keeps memory-mapped columns as views
+                df = pd.concat([entry.df, *extra], axis=1, copy=False)
+                df.attrs = entry.df.attrs
+                entry.df = df
+                size = int(sum(series.memory_usage(index=False, deep=True) for series in extra))
+                entry.nbytes += size
+                self._total_bytes += size
+            entry.complete = entry.complete or columns is None
+            return entry.df
+
+    def set_derived(self, token, name, value):
+        """ Attach an already built derived structure (e.g. one updated incrementally) """
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return
+            entry.derived[name] = value
+            self._count_derived(entry, name)
+            self._evict()
+
+    def get_derived(self, token, name, builder, columns=None):
+        """ Structure derived from a cached dataset (cube, index...), built once and evicted with it.
+
+        `columns` lists what `builder` reads, so a reloaded dataset only loads those.
+        Structures that cache results as they are used (the cube's roll-ups) are
+        measured again on each access, so their growth counts toward the budget.
+        """
+        df = self.get(token, columns)
+        if df is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and name in entry.derived:
+                value = entry.derived[name]
+                if self._count_derived(entry, name) > 0:
+                    self._evict()
+                return value
+
+        # Build outside the lock so other datasets stay available meanwhile
+        value = builder(df)
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and name not in entry.derived:
+                entry.derived[name] = value
+                self._count_derived(entry, name)
+                self._evict()
+        return value
+
+    def discard(self, token):
+        with self._lock:
+            self._pop(token)
+
+    def stats(self):
+        with self._lock:
+            return {"items": len(self._entries), "bytes": self._total_bytes}
+
+    def _count_derived(self, entry, name):
+        """ Bring the entry's size up to date with derived structure `name`; the change in bytes """
+        value = entry.derived.get(name)
+        size = _sizeof(value) if value is not None else 0
+        change = size - entry.derived_bytes.pop(name, 0)
+        if value is not None:
+            entry.derived_bytes[name] = size
+        entry.nbytes += change
+        self._total_bytes += change
+        return change
+
+    def _pop(self, token):
+        entry = self._entries.pop(token, None)
+        if entry is not None:
+            self._total_bytes -= entry.nbytes
+        return entry
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        expired = [token for token, entry in self._entries.items() if entry.last_access < cutoff]
+        for token in expired:
+            self._pop(token)
+
+    def _evict(self):
+        self._expire()
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_items or self._total_bytes > self.max_bytes
+        ):
+            self._pop(next(iter(self._entries)))
+
+
+def _sizeof(value):
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(deep=True).sum())
+    return int(getattr(value, "nbytes", 0))
+
+
+def load_dataset(token, columns=None):
+    """ Registry loader: a snapshot with `Group` recomputed under the current owner mapping """
+    if columns is not None and "Group" in columns and "Owner" not in columns:
+        columns = list(columns) + ["Owner"]
+    df = load_snapshot(token, columns)
+    if df is None:
+        return None
+    # Snapshots keep the groups they were processed with
+    return refresh_groups(df, {})[0]
+
+
+def refresh_groups(df, derived):
+    """ Remap `Group` through the owner categories after the owner -> group mapping changed.
+
+    Derived structures that involve Group are regrouped the same way (their
+    `regroup()`); any without a `regroup` method are dropped and rebuilt.
+    """
+    if "Owner" in df.columns and "Group" in df.columns:
+        # Callbacks may still be using the old frame, so don't modify it
+        df = df.copy(deep=False)
+        df["Group"] = assign_groups(df["Owner"])
+    derived = {name: value.regroup() for name, value in derived.items() if hasattr(value, "regroup")}
+    return df, {name: value for name, value in derived.items() if value is not None}
+
+
+registry = DatasetRegistry(
+    max_items=config.DATASET_CACHE_MAX_ITEMS,
+    ttl_seconds=config.DATASET_CACHE_TTL_SECONDS,
+    max_bytes=config.DATASET_CACHE_MAX_BYTES,
+    loader=load_dataset,
+    revision=groups_version,
+    refresh=refresh_groups,
+)
+
+
+def store_dataset(df, token=None, derived=None):
+    """ Cache a processed DataFrame and return the token to keep in `processed-data-store`.
+
+    `derived` ({name: structure}) seeds derived structures that were already
+    built for this frame, so `get_derived` does not rebuild them.
+    """
+    token = registry.put(df, token)
+    for name, value in (derived or {}).items():
+        registry.set_derived(token, name, value)
+    return token
+
+
+def get_dataset(token, columns=None):
+    """ Look up the DataFrame for a token, reloading its snapshot if needed; None if unknown.
+
+    Pass `columns` to let a reload read only what the caller needs; the
+    returned frame may still hold more columns.
+    """
+    return registry.get(token, columns)
@@ -0,0 +1,101 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import plotly.graph_objects as go
+
+import config
+
+
+class FigureCache:
+    """ Bounded LRU of built report figures.
+
+    Keys are (dataset token, page, normalized filter state), so flipping back
+    to a previous selection returns the figures that were already built.
+    Entries are evicted least-recently-used first once the item count or the
+    estimated figure size exceeds the budget.
+    """
+
+    def __init__(self, max_items, max_bytes):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, builder):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry[0]
+            self.misses += 1
+
+        value = builder()
+        nbytes = estimate_bytes(value)
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (value, nbytes)
+                self._total_bytes += nbytes
+                while len(self._entries) > 1 and (
+                    len(self._entries) > self.max_items or self._total_bytes > self.max_bytes
+                ):
+                    _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                    self._total_bytes -= evicted_bytes
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "items": len(self._entries),
+                "bytes": self._total_bytes,
+            }
+
+
+def normalize_filters(filters):
+    """ Hashable, order-independent form of {column: selected values} """
+    return tuple(sorted(
+        (col, tuple(sorted(map(str, values))))
+        for col, values in filters.items() if values
+    ))
+
+
+def estimate_bytes(value):
+    """ Rough in-memory size of cached figures (and frames), from their data arrays """
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_bytes(item) for item in value)
+    if isinstance(value, dict):
+        return sum(estimate_bytes(item) for item in value.values())
+    if isinstance(value, np.ndarray):
+        # Arrays inside serialized figures
+        return value.nbytes if value.dtype != object else 64 * value.size
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, go.Figure):
+        nbytes = 1024
+        for trace in value.data:
+            for prop in trace.to_plotly_json().values():
+                if isinstance(prop, np.ndarray):
+                    nbytes += prop.nbytes if prop.dtype != object else 64 * prop.size
+                elif isinstance(prop, (list, tuple)):
+                    nbytes += 64 * len(prop)
+        return nbytes
+    return 0
+
+
+figure_cache = FigureCache(
+    max_items=config.FIGURE_CACHE_MAX_ITEMS,
+    max_bytes=config.FIGURE_CACHE_MAX_BYTES,
+)
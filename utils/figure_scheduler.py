@@ -0,0 +1,46 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+
+
+class FigureScheduler:
+    """ Builds the independent figures of one report callback concurrently.
+
+    Each builder is a zero-argument callable returning a Plotly figure. They
+    run on a bounded thread pool shared by all callbacks, and with
+    `serialize` each figure is also turned into its plain dict form
+    (`to_plotly_json`) on the pool, so the callback only waits for the
+    slowest figure and Dash has less left to encode. Plotly builds figures
+    in Python, so the gain is bounded by the GIL: it comes from the NumPy
+    and pandas work that releases it, on machines with several cores. With
+    one thread (or one builder) everything runs inline.
+    """
+
+    def __init__(self, threads):
+        self.threads = threads
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def build(self, builders, serialize=False):
+        """ Results of `builders`, in order; the first exception raised by a builder is re-raised """
+        tasks = [lambda builder=builder: _build(builder, serialize) for builder in builders]
+        # Inline when there is nothing to overlap, or from a pool thread (a nested build would wait on itself)
+        if self.threads <= 1 or len(tasks) <= 1 or threading.current_thread().name.startswith("figure-build"):
+            return [task() for task in tasks]
+        futures = [self._executor().submit(task) for task in tasks]
+        return [future.result() for future in futures]
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="figure-build")
+            return self._pool
+
+
+def _build(builder, serialize):
+    figure = builder()
+    return figure.to_plotly_json() if serialize else figure
+
+
+figure_scheduler = FigureScheduler(threads=config.FIGURE_BUILD_THREADS)
@@ -0,0 +1,267 @@
+import io
+import base64
+import hashlib
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import config
+from utils.data_processing import process_data, compact_dtypes, align_categories
+from utils.aggregates import AggregateCube, get_cube
+from utils.dataset_cache import get_dataset, load_dataset, registry
+from utils.snapshots import attach_shared, content_token, save_snapshot
+
+
+class Base64Reader(io.RawIOBase):
+    """ Read-only binary stream over the base64 part of a `dcc.Upload` data URL.
+
+    The payload is decoded one block at a time as it is read, so the full
+    decoded file never has to exist alongside the encoded string.
+    """
+
+    def __init__(self, contents, block_size=config.INGEST_DECODE_BLOCK):
+        self._contents = contents
+        self._pos = contents.index(',') + 1  # skip the "data:<type>;base64," header without copying
+        self._block_size = block_size
+        self._buffer = b""
+        self._offset = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._offset >= len(self._buffer):
+            if self._pos >= len(self._contents):
+                return 0
+            block = self._contents[self._pos:self._pos + self._block_size]
+            self._pos += len(block)
+            self._buffer = base64.b64decode(block)
+            self._offset = 0
+
+        n = min(len(b), len(self._buffer) - self._offset)
+        b[:n] = self._buffer[self._offset:self._offset + n]
+        self._offset += n
+        return n
+
+
+def ingest_upload(contents, filename):
+    """ Single entry point for uploads: returns the processed frame and its metadata.
+
+    The dataset token is derived from the file contents; if a snapshot for it
+    exists (same file uploaded before, possibly by another process) it is
+    loaded instead of parsing the file again (with `Group` recomputed under
+    the current owner mapping), otherwise one is written. When shared memory
+    is enabled the returned frame is a view of the published copy.
+    """
+    token = content_token(contents)
+    df = load_dataset(token)
+    if df is None:
+        df = persist(token, read_upload(contents, filename))
+    return df, upload_meta(token, df, filename)
+
+
+def append_upload(token, uploads):
+    """ Append uploaded files ([(contents, filename)]) to the dataset behind `token`.
+
+    Rows whose DEDUPE_COLUMNS match a row already in the dataset (or earlier
+    in the uploads) are dropped before processing, so only new rows are run
+    through `process_data`, and the report cube is updated by merging in a
+    cube of the new rows. Returns the combined frame, its metadata (with a
+    new token) and the derived structures to seed with `store_dataset`.
+    Raises ValueError if the dataset is no longer available.
+    """
+    new_token = hashlib.sha256(
+        ":".join([token] + [content_token(contents) for contents, _ in uploads]).encode()
+    ).hexdigest()[:32]
+    filenames = ", ".join(filename for _, filename in uploads)
+
+    df = load_dataset(new_token)
+    if df is not None:
+        return df, upload_meta(new_token, df, filenames), {}
+
+    base = get_dataset(token)
+    if base is None:
+        raise ValueError('The dataset to append to is no longer available. Upload it again.')
+
+    keys = get_row_keys(token).copy()
+    new_rows = concat_chunks(read_upload(contents, filename, keys=keys) for contents, filename in uploads)
+    derived = {"row_keys": keys}
+    if new_rows.empty:
+        df = base.copy(deep=False)
+    else:
+        df = concat_chunks([base, new_rows])
+        derived["cube"] = get_cube(token).merge(AggregateCube.from_frame(new_rows))
+
+    df.attrs = {"append": {"added": len(new_rows), "skipped": keys.skipped}}
+    df = persist(new_token, df)
+    return df, upload_meta(new_token, df, filenames), derived
+
+
+def persist(token, df):
+    """ Snapshot a processed frame; returns the shared-memory view of it when there is one.
+
+    A snapshot that cannot be written (disk full, a column Arrow cannot
+    convert) leaves the dataset in memory only; the upload still succeeds.
+    """
+    try:
+        save_snapshot(token, df)
+    except (OSError, ValueError, TypeError, pa.ArrowException) as e:
+        print(f"Error in save_snapshot: {e}")
+    # Keep the shared copy rather than a private one when it was published
+    shared = attach_shared(token)
+    return df if shared is None else shared
+
+
+def upload_meta(token, df, filename):
+    return {
+        "token": token,
+        "filename": filename,
+        "rows": len(df),
+        "columns": list(df.columns),
+        "memory_usage": df.attrs.get("memory_usage"),
+        "append": df.attrs.get("append"),
+    }
+
+
+def read_upload(contents, filename, compact=config.COMPACT_DTYPES, chunk_rows=config.INGEST_CHUNK_ROWS, keys=None):
+    """ Decode, parse and process an uploaded CSV/Excel file.
+
+    CSV files are streamed through `process_data` in chunks of `chunk_rows`
+    rows, and each chunk is compacted before the next one is read, so peak
+    memory stays close to the size of the final frame. With `keys` (a
+    RowKeys), rows already seen are dropped before processing. Raises
+    ValueError for unsupported file types.
+    """
+    if filename.endswith('.csv'):
+        stream = io.BufferedReader(Base64Reader(contents))
+        chunks = pd.read_csv(stream, chunksize=chunk_rows, encoding='utf-8')
+        return concat_chunks(process_chunk(chunk, compact, keys) for chunk in chunks)
+
+    if filename.endswith('.xlsx'):
+        # openpyxl needs a seekable file, so decode (incrementally) into a single buffer
+        buffer = io.BytesIO()
+        shutil.copyfileobj(Base64Reader(contents), buffer)
+        buffer.seek(0)
+        return process_chunk(pd.read_excel(buffer), compact, keys)
+
+    raise ValueError('Unsupported format. Upload CSV or Excel.')
+
+
+def process_chunk(chunk, compact, keys=None):
+    if keys is not None:
+        chunk = keys.take_new(chunk)
+    chunk = process_data(chunk)
+    return compact_dtypes(chunk) if compact else chunk
+
+
+def concat_chunks(chunks):
+    """ Concatenate processed chunks, keeping categorical columns categorical """
+    chunks = list(chunks)
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0]
+
+    before = sum(chunk.attrs.get("memory_usage", {}).get("before", 0) for chunk in chunks)
+    chunks = unify_text_columns(chunks)
+    # Chunks see different subsets of values; align them on the union of categories
+    chunks = align_categories(chunks)
+    df = pd.concat(chunks, ignore_index=True)
+    if before:
+        df.attrs["memory_usage"] = {"before": before, "after": int(df.memory_usage(deep=True).sum())}
+    return df
+
+
+def unify_text_columns(chunks):
+    """ Chunks with every column that is text in one of them converted to text in all.
+
+    `read_csv` infers dtypes per chunk, so a column of digits with one text
+    value (e.g. "not given") in a later chunk is read as numbers in the
+    others. A single read gives text throughout; the numbers are written
+    back the way they appeared in the file, and missing values stay missing.
+    """
+    text_columns = {col for chunk in chunks for col in chunk.columns if _is_text(chunk[col])}
+    unified = []
+    for chunk in chunks:
+        numeric = [col for col in chunk.columns if col in text_columns and not _is_text(chunk[col])]
+        if numeric:
+            chunk = chunk.copy(deep=False)
+            for col in numeric:
+                chunk[col] = _as_text(chunk[col])
+        unified.append(chunk)
+    return unified
+
+
+def _is_text(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.categories.dtype == object
+    return series.dtype == object
+
+
+def _as_text(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.rename_categories(_as_text(series.cat.categories.to_series()).to_numpy())
+    values = series
+    if pd.api.types.is_float_dtype(values) and (values.dropna() % 1 == 0).all():
+        # A missing value turns an integer column into floats; write 9000000193.0 as 9000000193
+        values = values.astype("Int64")
+    return values.astype(str).where(series.notna())
+
+
+# Rows with the same values here are the same call; appended files skip them
+DEDUPE_COLUMNS = ["Lead | Phone Number", "CreatedOn", "ActivityEvent"]
+
+
+def row_hashes(df):
+    """ 64-bit hash of each row's DEDUPE_COLUMNS, comparable between raw and processed frames """
+    keys = pd.DataFrame(index=df.index)
+    for col in DEDUPE_COLUMNS:
+        if col not in df.columns:
+            continue
+        values = df[col]
+        if col == "CreatedOn":
+            values = pd.to_datetime(values, errors="coerce")
+        else:
+            if pd.api.types.is_float_dtype(values) and (values.dropna() % 1 == 0).all():
+                # A missing value turns an integer column into floats; hash 9000000193.0 like 9000000193
+                values = values.astype("Int64")
+            values = values.astype(str).where(values.notna(), "")
+        keys[col] = values
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+
+class RowKeys:
+    """ Sorted row hashes of a dataset, used to drop duplicate rows when appending """
+
+    def __init__(self, hashes):
+        self.hashes = hashes
+        self.skipped = 0
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(np.unique(row_hashes(df)))
+
+    @property
+    def nbytes(self):
+        return self.hashes.nbytes
+
+    def copy(self):
+        return RowKeys(self.hashes.copy())
+
+    def regroup(self):
+        return self  # Group is not part of the key
+
+    def take_new(self, df):
+        """ Rows of `df` not seen before (nor earlier in `df`); their keys are added to the set """
+        hashes = row_hashes(df)
+        new = ~np.isin(hashes, self.hashes) & ~pd.Series(hashes).duplicated().to_numpy()
+        self.hashes = np.union1d(self.hashes, hashes[new])
+        self.skipped += int(len(df) - new.sum())
+        return df.take(np.flatnonzero(new))
+
+
+def get_row_keys(token):
+    """ Row hashes for a cached dataset, built on first use """
+    return registry.get_derived(token, "row_keys", RowKeys.from_frame, columns=DEDUPE_COLUMNS)
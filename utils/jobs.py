@@ -0,0 +1,192 @@
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import config
+
+
+class Job:
+    """ State of one background job, updated by the job function as it runs """
+
+    def __init__(self, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.state = "queued"
+        self.done = 0
+        self.total = 0
+        self.result = None
+        self.error = None
+        self.finished_at = None
+        self.on_change = None  # set by JobQueue to share the progress with other workers
+
+    def advance(self, steps=1):
+        self.done += steps
+        if self.on_change is not None:
+            self.on_change(self)
+
+    def progress(self):
+        """ Percentage and label for a progress bar """
+        if self.state == "done":
+            return 100, "Done"
+        if self.state == "failed":
+            return 100, f"Failed: {self.error}"
+        if self.state == "queued" or not self.total:
+            return 0, self.state.capitalize()
+        percent = int(100 * self.done / self.total)
+        return percent, f"{percent}%"
+
+
+class JobQueue:
+    """ Local queue for slow work (PDF exports) that must not block request threads.
+
+    Jobs are orchestrated on a small thread pool; CPU-heavy steps such as
+    Kaleido rendering are sent to a lazily started process pool through
+    `run_in_process`. Each job's state, and once it is done its result, is
+    also written under DATA_DIR/jobs, so a poll that lands on another worker
+    still finds it. Finished jobs are kept for `ttl_seconds` so the page can
+    poll for the result.
+    """
+
+    def __init__(self, threads, processes, ttl_seconds):
+        self.ttl_seconds = ttl_seconds
+        self._processes = processes
+        self._threads = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="export-job")
+        self._process_pool = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args):
+        """ Run `fn(job, *args)` in the background and return the job id """
+        job = Job()
+        job.on_change = self._save
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._save(job)
+        self._threads.submit(self._run, job, fn, args)
+        return job.id
+
+    def get(self, job_id):
+        """ The job from this worker, or as last saved by the worker running it; None if unknown """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job if job is not None else self._load(job_id)
+
+    def discard(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+        if not valid_job_id(job_id):
+            return
+        for path in job_paths(job_id):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def submit_process(self, fn, *args):
+        """ Run a picklable function in the render process pool; returns its future """
+        return self._pool().submit(fn, *args)
+
+    def _pool(self):
+        with self._lock:
+            if self._process_pool is None:
+                # spawn: forking a threaded web worker is not safe
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self._processes, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._process_pool
+
+    def _run(self, job, fn, args):
+        job.state = "running"
+        self._save(job)
+        try:
+            job.result = fn(job, *args)
+            job.state = "done"
+        except Exception as e:
+            print(f"Error in background job {job.id}: {e}")  # Debugging
+            job.error = str(e)
+            job.state = "failed"
+        job.finished_at = time.monotonic()
+        self._save(job)
+
+    def _save(self, job):
+        """ Write the job's state (and its result once done) for the other workers """
+        state_path, result_path = job_paths(job.id)
+        try:
+            os.makedirs(os.path.dirname(state_path), exist_ok=True)
+            # The result is in place before the state that points readers to it
+            if job.state == "done":
+                _write(result_path, job.result)
+            state = {"state": job.state, "done": job.done, "total": job.total, "error": job.error}
+            _write(state_path, json.dumps(state).encode())
+        except OSError as e:
+            print(f"Error in JobQueue._save: {e}")
+
+    def _load(self, job_id):
+        if not valid_job_id(job_id):
+            return None
+        state_path, result_path = job_paths(job_id)
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+            job = Job(job_id)
+            job.state, job.done, job.total, job.error = state["state"], state["done"], state["total"], state["error"]
+            if job.state == "done":
+                with open(result_path, "rb") as f:
+                    job.result = f.read()
+        except FileNotFoundError:
+            return None  # expired, or never seen by any worker
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error in JobQueue._load: {e}")
+            return None
+        return job
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished_at and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+        # Files of jobs whose worker never discarded them
+        directory = jobs_dir()
+        if not os.path.isdir(directory):
+            return
+        cutoff = time.time() - self.ttl_seconds
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+def valid_job_id(job_id):
+    """ Job ids come back from the browser; only ours (uuid4 hex) are turned into paths """
+    return isinstance(job_id, str) and re.fullmatch(r"[0-9a-f]{32}", job_id) is not None
+
+
+def jobs_dir():
+    return os.path.join(config.DATA_DIR, "jobs")
+
+
+def job_paths(job_id):
+    """ (state file, result file) of a job """
+    return os.path.join(jobs_dir(), f"{job_id}.json"), os.path.join(jobs_dir(), f"{job_id}.result")
+
+
+def _write(path, data):
+    # Written to a temporary name and renamed into place, so readers never see a partial file
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+job_queue = JobQueue(
+    threads=config.EXPORT_JOB_THREADS,
+    processes=config.EXPORT_RENDER_PROCESSES,
+    ttl_seconds=config.EXPORT_JOB_TTL_SECONDS,
+)
@@ -0,0 +1,143 @@
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+import flask
+
+# Upper bounds of the histogram buckets
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = (1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7)
+
+# Phase timings of the Dash request being handled; None outside one
+_phases = contextvars.ContextVar("callback_phases", default=None)
+
+
+class Histogram:
+    """ Prometheus-style cumulative histogram with labels, kept in process memory """
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), values[:-1]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {values[-1]}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return "\n".join(lines)
+
+
+callback_seconds = Histogram(
+    "dash_callback_seconds",
+    "Time spent per Dash callback request, by phase (decode, callback, aggregate, figures, serialize, total)",
+    SECONDS_BUCKETS,
+)
+callback_bytes = Histogram(
+    "dash_callback_payload_bytes",
+    "Size of Dash callback request and response bodies",
+    BYTES_BUCKETS,
+)
+
+
+@contextmanager
+def phase(name):
+    """ Time a block as phase `name` of the current callback; a no-op outside a Dash request """
+    phases = _phases.get()
+    if phases is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+
+
+def instrument(app):
+    """ Record timings and payload sizes of every callback registered on `app` after this call.
+
+    `app.callback` is wrapped so each callback body is timed as the
+    "callback" phase; Flask hooks around the Dash update route time the
+    JSON decode and the whole request, and measure both payloads.
+    """
+    register = app.callback
+
+    @functools.wraps(register)
+    def callback(*args, **kwargs):
+        decorator = register(*args, **kwargs)
+
+        def wrap(func):
+            @functools.wraps(func)
+            def timed(*func_args, **func_kwargs):
+                with phase("callback"):
+                    return func(*func_args, **func_kwargs)
+            return decorator(timed)
+        return wrap
+
+    app.callback = callback
+    server = app.server
+
+    @server.before_request
+    def start_callback_timing():
+        if not flask.request.path.endswith("/_dash-update-component"):
+            return
+        phases = {}
+        flask.g.callback_phases = phases
+        flask.g.callback_token = _phases.set(phases)
+        flask.g.callback_start = time.perf_counter()
+        with phase("decode"):
+            # Flask caches the parsed body, so Dash does not decode it again
+            body = flask.request.get_json(silent=True) or {}
+        flask.g.callback_id = body.get("output", "unknown")
+
+    @server.after_request
+    def record_callback_timing(response):
+        phases = flask.g.pop("callback_phases", None)
+        if phases is None:
+            return response
+        total = time.perf_counter() - flask.g.pop("callback_start")
+        callback_id = flask.g.pop("callback_id")
+
+        # Whatever the phases don't cover is Dash's own work, mostly encoding the response
+        phases["serialize"] = max(0.0, total - phases.get("decode", 0.0) - phases.get("callback", 0.0))
+        phases["total"] = total
+        for name, seconds in phases.items():
+            callback_seconds.observe(seconds, callback=callback_id, phase=name)
+        callback_bytes.observe(flask.request.content_length or 0, callback=callback_id, direction="request")
+        callback_bytes.observe(response.calculate_content_length() or 0, callback=callback_id, direction="response")
+        return response
+
+    @server.teardown_request
+    def stop_callback_timing(exc):
+        token = flask.g.pop("callback_token", None)
+        if token is not None:
+            _phases.reset(token)
+
+    @server.route("/metrics")
+    def metrics():
+        text = "\n".join(histogram.render() for histogram in (callback_seconds, callback_bytes)) + "\n"
+        return flask.Response(text, mimetype="text/plain; version=0.0.4")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,91 @@
+import json
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import config
+
+UNKNOWN_GROUP = "Unknown"
+
+
+class OwnerGroups:
+    """ Owner -> group mapping read from OWNER_GROUPS_FILE and reloaded when the file changes.
+
+    The file's mtime is checked at most every `poll_seconds`. `version` is a
+    hash of the file contents, so every worker agrees on it; cached datasets,
+    aggregates and figures record the version they were built with.
+    """
+
+    def __init__(self, path, poll_seconds):
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self.mapping = {}
+        self.version = None
+        self._mtime = None
+        self._checked = float("-inf")  # never checked: the first call loads the file
+        self._lock = threading.Lock()
+
+    def current(self):
+        """ (mapping, version), reloading the file first if it changed """
+        now = time.monotonic()
+        if now - self._checked >= self.poll_seconds:
+            with self._lock:
+                self._checked = now
+                self._reload()
+        return self.mapping, self.version
+
+    def _reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime == self._mtime:
+                return
+            with open(self.path, 'rb') as f:
+                raw = f.read()
+            groups = json.loads(raw)
+        except (OSError, ValueError) as e:
+            # Keep the last good mapping rather than regrouping everyone as Unknown
+            print(f"Error in OwnerGroups._reload: {e}")
+            return
+        self.mapping = {owner: group for group, owners in groups.items() for owner in owners}
+        self.version = hashlib.sha256(raw).hexdigest()[:12]
+        self._mtime = mtime
+
+
+owner_groups = OwnerGroups(config.OWNER_GROUPS_FILE, config.OWNER_GROUPS_POLL_SECONDS)
+
+
+def groups_version():
+    return owner_groups.current()[1]
+
+
+def group_lookup(owners):
+    """ Group of each owner in `owners` (an Index of names), as a categorical; O(len(owners)) """
+    mapping, _ = owner_groups.current()
+    groups = pd.Index(owners, dtype=object).map(lambda owner: mapping.get(owner, UNKNOWN_GROUP))
+    return pd.Categorical(groups)
+
+
+def assign_groups(owner):
+    """ Categorical `Group` column for an `Owner` column.
+
+    The mapping is applied to the owner categories only and the group codes
+    are gathered through the owner codes, so the cost in Python is per
+    distinct owner. Missing owners are grouped as Unknown.
+    """
+    if isinstance(owner.dtype, pd.CategoricalDtype):
+        codes, owners = owner.cat.codes.to_numpy(), owner.cat.categories
+    else:
+        codes, owners = pd.factorize(owner)
+    lookup = group_lookup(owners)
+    if UNKNOWN_GROUP not in lookup.categories:
+        lookup = lookup.add_categories([UNKNOWN_GROUP])
+    # Code -1 (missing owner) picks the extra slot at the end
+    group_codes = np.append(lookup.codes, lookup.categories.get_loc(UNKNOWN_GROUP))
+    return pd.Series(
+        pd.Categorical.from_codes(group_codes[codes], lookup.categories),
+        index=owner.index, name="Group",
+    )
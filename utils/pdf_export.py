@@ -0,0 +1,95 @@
+import io
+from concurrent.futures import as_completed
+
+from dash import dcc, no_update
+
+from utils.jobs import job_queue
+
+HIDDEN = {"display": "none"}
+
+
+def render_png(figure):
+    """ Render a figure (dict form) to PNG bytes; runs in the render process pool """
+    import plotly.io as pio
+
+    return pio.to_image(figure, format='png')
+
+
+def render_figures(job, figures):
+    """ Render figures concurrently in the process pool and return their PNG bytes in order """
+    futures = {job_queue.submit_process(render_png, fig.to_dict()): i for i, fig in enumerate(figures)}
+    images = [None] * len(figures)
+    for future in as_completed(futures):
+        images[futures[future]] = future.result()
+        job.advance()
+    return images
+
+
+def assemble_pdf(images, titles=None, width=700, height=400, gap=50, x=None):
+    """ Lay PNG images out top to bottom on A3 pages and return the PDF bytes.
+
+    Images are centred unless `x` is given; `titles`, if any, are drawn above
+    each image.
+    """
+    # ReportLab is only needed once an export runs, so keep it out of app startup
+    from reportlab.lib.pagesizes import A3
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A3)
+    page_width, page_height = A3
+    x_position = (page_width - width) / 2 if x is None else x
+    y_position = page_height - 100
+
+    for i, image in enumerate(images):
+        if titles:
+            c.setFont("Helvetica-Bold", 18)
+            c.drawString(x_position + 50, y_position + 20, titles[i])
+        c.drawImage(ImageReader(io.BytesIO(image)), x_position, y_position - height, width=width, height=height)
+        y_position -= (height + gap)
+        if y_position < 100:
+            c.showPage()
+            y_position = page_height - 100
+
+    c.save()
+    return buffer.getvalue()
+
+
+def export_pdf(job, figures, titles=None, **layout):
+    """ Job body: render `figures` and return the assembled PDF bytes """
+    job.total = len(figures) + 1
+    images = render_figures(job, figures)
+    pdf = assemble_pdf(images, titles, **layout)
+    job.advance()
+    return pdf
+
+
+def export_outputs(start, token, job_id, build, filename):
+    """ Outputs of a page's PDF export callback.
+
+    Returns (download data, job id, poll disabled, progress value, progress
+    label, progress style). `start` is True when the export button fired and
+    `build(job, token)` is queued for the dataset `token` (None when there is
+    no data); otherwise the poll interval fired and the job `job_id` is checked.
+    """
+    if start:
+        if token is None:
+            return None, None, True, 0, "", HIDDEN
+        return no_update, job_queue.submit(build, token), False, 0, "Queued", {}
+
+    if job_id is None:
+        return no_update, None, True, 0, "", HIDDEN
+    job = job_queue.get(job_id)
+    if job is None:
+        # Expired, or lost with the worker that ran it
+        return no_update, None, True, 100, "Export not found. Please start it again.", {}
+
+    value, label = job.progress()
+    if job.state == "done":
+        job_queue.discard(job_id)
+        return dcc.send_bytes(job.result, filename), None, True, value, label, {}
+    if job.state == "failed":
+        job_queue.discard(job_id)
+        return no_update, None, True, value, label, {}
+    return no_update, no_update, False, value, label, {}
@@ -0,0 +1,99 @@
+import numpy as np
+from dash import Patch
+
+import config
+
+OTHER = "Other"
+
+
+def budget(figure, key, default=None):
+    """ Rendering budget `key` ("points"/"categories") for a figure id in FIGURE_BUDGETS """
+    return config.FIGURE_BUDGETS.get(figure, {}).get(key, default)
+
+
+def render_mode(n_points):
+    """ `render_mode` for px.line/px.scatter: WebGL once a figure has too many points for SVG """
+    return "webgl" if n_points > config.WEBGL_POINT_THRESHOLD else "auto"
+
+
+def figure_patch(figure):
+    """ Patch that swaps the traces of a figure already on screen, leaving its layout and template in place """
+    patch = Patch()
+    patch["data"] = figure.to_plotly_json()["data"]
+    return patch
+
+
+def fold_categories(df, column, values, limit, by=()):
+    """ Keep the `limit - 1` largest categories of `column` and sum the rest into "Other".
+
+    Size is the total of the first of `values`. Rows are regrouped on
+    `column` plus `by` (e.g. the colour column of a stacked bar), summing
+    `values`; other columns are dropped. Frames within the limit are
+    returned unchanged.
+    """
+    if not limit or df[column].nunique() <= limit:
+        return df
+    totals = df.groupby(column, observed=True)[values[0]].sum()
+    keep = totals.nlargest(limit - 1).index
+    labels = df[column].astype(object).where(df[column].isin(keep), OTHER)
+    keys = [column, *by]
+    folded = df.assign(**{column: labels}).groupby(keys, observed=True, sort=False)[list(values)].sum().reset_index()
+    # Largest first, with Other last
+    order = {label: i for i, label in enumerate(list(keep) + [OTHER])}
+    return folded.sort_values(column, key=lambda labels: labels.map(order), kind="stable").reset_index(drop=True)
+
+
+def downsample(df, x, y, limit, method=None):
+    """ At most about `limit` rows of a time series, keeping its visual shape.
+
+    "lttb" (Largest-Triangle-Three-Buckets) keeps one representative point
+    per bucket; "minmax" keeps each bucket's lowest and highest point, so
+    spikes survive. Rows are returned in their original order.
+    """
+    if not limit or len(df) <= limit:
+        return df
+    method = method or config.TIMESERIES_DOWNSAMPLING
+    xs = df[x].to_numpy()
+    xs = xs.astype("datetime64[ns]").astype(np.int64) if np.issubdtype(xs.dtype, np.datetime64) else xs.astype(np.float64)
+    ys = df[y].to_numpy(dtype=np.float64)
+    rows = minmax_rows(ys, limit) if method == "minmax" else lttb_rows(xs, ys, limit)
+    return df.iloc[rows].reset_index(drop=True)
+
+
+def lttb_rows(xs, ys, limit):
+    """ Row positions picked by Largest-Triangle-Three-Buckets (first and last always kept) """
+    n = len(xs)
+    limit = max(limit, 3)
+    xs = xs.astype(np.float64)
+    # Bucket edges over the points between the first and the last
+    edges = np.linspace(1, n - 1, limit - 1).astype(np.int64)
+    rows = np.empty(limit, dtype=np.int64)
+    rows[0], rows[-1] = 0, n - 1
+    previous = 0
+    for i in range(limit - 2):
+        start, stop = edges[i], edges[i + 1]
+        # The next bucket's mean is the third corner of the triangle
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        next_x, next_y = xs[stop:next_stop].mean(), ys[stop:next_stop].mean()
+        px, py = xs[previous], ys[previous]
+        area = np.abs((px - next_x) * (ys[start:stop] - py) - (px - xs[start:stop]) * (next_y - py))
+        previous = start + int(np.argmax(area))
+        rows[i + 1] = previous
+    return rows
+
+
+def minmax_rows(ys, limit):
+    """ Row positions of the min and max of each of `limit // 2` equal buckets """
+    n = len(ys)
+    buckets = max(1, limit // 2)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    starts = edges[:-1][np.diff(edges) > 0]
+    lows = np.minimum.reduceat(ys, starts)
+    highs = np.maximum.reduceat(ys, starts)
+    # First position of each bucket's min/max
+    bucket = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, n)))
+    is_low = ys == lows[bucket]
+    is_high = ys == highs[bucket]
+    low_rows = np.flatnonzero(is_low)[np.unique(bucket[is_low], return_index=True)[1]]
+    high_rows = np.flatnonzero(is_high)[np.unique(bucket[is_high], return_index=True)[1]]
+    return np.unique(np.concatenate([low_rows, high_rows]))
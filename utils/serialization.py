@@ -0,0 +1,68 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+import config
+
+try:
+    import orjson
+except ImportError:  # optional: responses fall back to Plotly's encoder
+    orjson = None
+
+
+# Characters escaped the way Plotly does, so the JSON is safe inside an HTML <script>
+_UNSAFE = (("<", "\\u003c"), (">", "\\u003e"), ("/", "\\u002f"), ("\u2028", "\\u2028"), ("\u2029", "\\u2029"))
+
+
+def _default(value):
+    """ orjson fallback for what it cannot encode natively """
+    if hasattr(value, "to_plotly_json"):
+        # Dash components, Patch objects and Plotly figures
+        return value.to_plotly_json()
+    if isinstance(value, np.ndarray):
+        # Object (string) and non-contiguous arrays
+        return value.tolist()
+    if isinstance(value, (pd.Series, pd.Index)):
+        return value.to_numpy()
+    if isinstance(value, np.generic):
+        return value.item()
+    if value is pd.NaT:
+        return None
+    if isinstance(value, (datetime.date, datetime.time)):
+        # pandas Timestamps
+        return value.isoformat()
+    raise TypeError
+
+
+def to_json(value):
+    """ JSON text of a Dash response, layout or figure.
+
+    Encoded by orjson in one pass, with NumPy arrays written natively and
+    components or figures expanded through `to_plotly_json`. Plotly's own
+    orjson engine first fails on the components and then cleans the whole
+    tree in Python. Values orjson still rejects go to Plotly's JSON encoder.
+    """
+    from plotly.io.json import to_json_plotly
+
+    if orjson is None or config.JSON_ENCODER != "orjson":
+        return to_json_plotly(value)
+    try:
+        text = orjson.dumps(value, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode()
+    except TypeError:
+        return to_json_plotly(value, engine="json")
+    for unsafe, safe in _UNSAFE:
+        if unsafe in text:
+            text = text.replace(unsafe, safe)
+    return text
+
+
+def install_json_encoder():
+    """ Make Dash encode callback responses and layouts with `to_json` """
+    import dash._callback
+    import dash.dash
+
+    # Dash imports its encoder by name into these modules
+    for module in (dash._callback, dash.dash):
+        if hasattr(module, "to_json"):
+            module.to_json = to_json
@@ -0,0 +1,163 @@
+import os
+import json
+import hashlib
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+import config
+
+# Bump when process_data/compact_dtypes change so old snapshots are not reused
+SNAPSHOT_VERSION = 1
+
+HASH_BLOCK = 4 * 1024 * 1024
+
+
+def content_token(contents):
+    """ Dataset token derived from the uploaded bytes and the processing settings.
+
+    The base64 payload is hashed block by block, so identical uploads map to
+    the same token without decoding them.
+    """
+    digest = hashlib.sha256(f"v{SNAPSHOT_VERSION}:compact={config.COMPACT_DTYPES}:".encode())
+    start = contents.index(',') + 1
+    for pos in range(start, len(contents), HASH_BLOCK):
+        digest.update(contents[pos:pos + HASH_BLOCK].encode('ascii'))
+    return digest.hexdigest()[:32]
+
+
+def snapshot_path(token):
+    return os.path.join(config.DATA_DIR, f"{token}.parquet")
+
+
+def has_snapshot(token):
+    return os.path.exists(snapshot_path(token))
+
+
+def shared_path(token):
+    return os.path.join(config.SHARED_DIR, f"{token}.arrow")
+
+
+def save_snapshot(token, df):
+    """ Persist a processed frame and publish it for the other workers.
+
+    Files are written to a temporary name and renamed into place, so readers
+    never see a partial snapshot.
+    """
+    os.makedirs(config.DATA_DIR, exist_ok=True)
+    path = snapshot_path(token)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        df.to_parquet(tmp_path, engine='pyarrow', index=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        # Don't leave a partial file behind in DATA_DIR
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    prune_files(config.DATA_DIR, '.parquet', config.SNAPSHOT_MAX_BYTES, keep=path)
+    publish_shared(token, df)
+
+
+def publish_shared(token, df):
+    """ Write `df` as an uncompressed Arrow file under SHARED_DIR (tmpfs by default).
+
+    Every worker memory-maps the same file, so numeric, datetime and
+    categorical columns are shared between processes instead of copied;
+    only free-text (object) columns are still materialized per worker.
+    """
+    if not config.SHARED_DIR:
+        return
+    try:
+        os.makedirs(config.SHARED_DIR, exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        for i, field in enumerate(table.schema):
+            # Keep NaN as a value: nulls would make every reader fill them into a private copy
+            if pa.types.is_floating(field.type) and table.column(i).null_count:
+                table = table.set_column(i, field, pa.array(df[field.name].to_numpy(), from_pandas=False))
+        metadata = dict(table.schema.metadata or {})
+        metadata[b'dash_reports_attrs'] = json.dumps(df.attrs).encode()
+        table = table.replace_schema_metadata(metadata)
+
+        path = shared_path(token)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with ipc.new_file(tmp_path, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, path)
+        prune_files(config.SHARED_DIR, '.arrow', config.SHARED_MAX_BYTES, keep=path)
+    except (OSError, TypeError, pa.ArrowException) as e:
+        print(f"Error in publish_shared: {e}")
+
+
+def attach_shared(token, columns=None):
+    """ Zero-copy view of a published frame, limited to `columns`; None if not published """
+    if not config.SHARED_DIR:
+        return None
+    path = shared_path(token)
+    try:
+        table = ipc.open_file(pa.memory_map(path)).read_all()
+    except (FileNotFoundError, pa.ArrowException):
+        return None
+    if columns is not None:
+        table = table.select([col for col in columns if col in table.column_names])
+    # split_blocks keeps each column a view over its own buffer instead of consolidating into copies
+    df = table.to_pandas(split_blocks=True)
+    attrs = (table.schema.metadata or {}).get(b'dash_reports_attrs')
+    if attrs:
+        df.attrs.update(json.loads(attrs))
+    os.utime(path)  # recency for prune_files
+    return df
+
+
+def load_snapshot(token, columns=None):
+    """ Frame for a token from shared memory, or else from its Parquet snapshot; None if there is none.
+
+    A snapshot read from Parquet is published to shared memory (in full) so
+    the next worker can attach to it.
+    """
+    df = attach_shared(token, columns)
+    if df is not None:
+        return df
+
+    path = snapshot_path(token)
+    if config.SHARED_DIR and os.path.exists(path):
+        try:
+            publish_shared(token, pd.read_parquet(path, engine='pyarrow', memory_map=True))
+        except (OSError, ValueError) as e:
+            print(f"Error in load_snapshot: {e}")
+        df = attach_shared(token, columns)
+        if df is not None:
+            return df
+
+    try:
+        if columns is not None:
+            names = pq.read_schema(path, memory_map=True).names
+            columns = [col for col in columns if col in names]
+        df = pd.read_parquet(path, engine='pyarrow', columns=columns, memory_map=True)
+    except (FileNotFoundError, ValueError):  # ArrowInvalid is a ValueError
+        return None
+    os.utime(path)  # recency for prune_files
+    return df
+
+
+def prune_files(directory, suffix, max_bytes, keep=None):
+    """ Delete the least recently used `suffix` files in `directory` beyond `max_bytes` """
+    try:
+        entries = [entry for entry in os.scandir(directory) if entry.name.endswith(suffix)]
+    except FileNotFoundError:
+        return
+    entries.sort(key=lambda entry: entry.stat().st_mtime)
+    total = sum(entry.stat().st_size for entry in entries)
+    for entry in entries:
+        if total <= max_bytes:
+            break
+        if entry.path == keep:
+            continue
+        total -= entry.stat().st_size
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass  # another worker pruned it first
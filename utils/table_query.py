@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+# DataTable filter operators, longest-first where one is a prefix of another
+FILTER_OPERATORS = [
+    ['ge ', '>='],
+    ['le ', '<='],
+    ['lt ', '<'],
+    ['gt ', '>'],
+    ['ne ', '!='],
+    ['eq ', '='],
+    ['contains '],
+    ['datestartswith '],
+]
+
+
+def split_filter_part(filter_part):
+    """ Parse one `{column} op value` clause of a DataTable filter_query """
+    # The column name ends at the first "}" after the "{"; the value may contain braces
+    name_start = filter_part.find('{') + 1
+    name_end = filter_part.find('}', name_start)
+    name = filter_part[name_start:name_end]
+    # The operator starts the rest: names and values like "Lead | Phone Number" or "Google Ads" contain "ne " or "le "
+    expression = filter_part[name_end + 1:].lstrip()
+
+    for operator_type in FILTER_OPERATORS:
+        for operator in operator_type:
+            if expression.startswith(operator):
+                value_part = expression[len(operator):].strip()
+                v0 = value_part[0] if value_part else ''
+                if v0 == value_part[-1:] and v0 in ("'", '"', '`'):
+                    value = value_part[1: -1].replace('\\' + v0, v0)
+                else:
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+
+                # word operators need spaces after them in the filter string,
+                # but we don't want these later
+                return name, operator_type[0].strip(), value
+
+    return [None] * 3
+
+
+def filter_mask(series, operator, value):
+    if operator == 'contains':
+        return _string_mask(series, lambda values: values.str.contains(str(value), regex=False))
+    if operator == 'datestartswith':
+        return _string_mask(series, lambda values: values.str.startswith(str(value)))
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Compare against the category table and expand through the codes
+        categories = series.cat.categories.to_series(index=range(len(series.cat.categories)))
+        return series.cat.codes.isin(categories.index[filter_mask(categories, operator, value)]).to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(series):
+        value = pd.to_datetime(value, errors='coerce')
+    elif pd.api.types.is_numeric_dtype(series) and isinstance(value, str):
+        value = pd.to_numeric(value, errors='coerce')
+
+    if operator == 'eq':
+        return (series == value).to_numpy()
+    if operator == 'ne':
+        return (series != value).to_numpy()
+    if operator == 'lt':
+        return (series < value).to_numpy()
+    if operator == 'le':
+        return (series <= value).to_numpy()
+    if operator == 'gt':
+        return (series > value).to_numpy()
+    if operator == 'ge':
+        return (series >= value).to_numpy()
+    raise ValueError(f'Unsupported filter operator: {operator}')
+
+
+def _string_mask(series, predicate):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        matched = predicate(series.cat.categories.astype(str).to_series()).fillna(False).to_numpy()
+        return series.cat.codes.isin(matched.nonzero()[0]).to_numpy()
+    return predicate(series.astype(str)).fillna(False).to_numpy()
+
+
+def query_frame(df, filter_query=None, sort_by=None):
+    """ Apply DataTable `filter_query` and `sort_by` props to a frame """
+    if filter_query:
+        for filter_part in filter_query.split(' && '):
+            col_name, operator, filter_value = split_filter_part(filter_part)
+            if col_name in df.columns:
+                try:
+                    mask = filter_mask(df[col_name], operator, filter_value)
+                except TypeError:
+                    # e.g. `{Owner} > 5`: nothing matches an incomparable value
+                    mask = np.zeros(len(df), dtype=bool)
+                df = df[mask]
+
+    sort_by = [col for col in (sort_by or []) if col['column_id'] in df.columns]
+    if sort_by:
+        df = df.sort_values(
+            [col['column_id'] for col in sort_by],
+            ascending=[col['direction'] == 'asc' for col in sort_by],
+            kind='stable',
+        )
+    return df
+
+
+def page_records(df, page_current, page_size):
+    """ Rows of one DataTable page as records, plus the total page count """
+    page_count = max(1, -(-len(df) // page_size))
+    # A narrower filter can leave the current page past the end
+    start = min(page_current or 0, page_count - 1) * page_size
+    return df.iloc[start:start + page_size].to_dict('records'), page_count
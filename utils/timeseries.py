@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+
+from utils.dataset_cache import registry
+
+# Granularities offered for call-volume charts, as bucket widths in minutes
+GRANULARITIES = {"h": 60, "D": 24 * 60, "W": 7 * 24 * 60}
+DEFAULT_GRANULARITY = "h"
+
+# The epoch is a Thursday; weeks start on Monday 1970-01-05
+WEEK_OFFSET = 4 * 24 * 60
+
+# Raw columns the time series is built from
+TIMESERIES_COLUMNS = ["CreatedOn", "Call Duration Seconds"]
+
+
+class CallTimeSeries:
+    """ Call counts and durations over time, built once per dataset.
+
+    `CreatedOn` is reduced to whole minutes once and the rows are kept in
+    time order, together with per-minute totals for the whole dataset. A
+    series at any granularity is rolled up from those minute buckets; for
+    filtered rows the date range is cut from the sorted index with binary
+    search and only the rows in range are bucketed. Rows without a
+    timestamp are left out.
+    """
+
+    def __init__(self, created_on, durations):
+        created_on = pd.to_datetime(created_on, errors="coerce")  # no-op when parsed at ingest
+        minutes = created_on.to_numpy(dtype="datetime64[m]").astype(np.int64)
+        valid = ~created_on.isna().to_numpy()
+        durations = np.nan_to_num(np.asarray(durations, dtype=np.float64))
+
+        # Row positions in time order, with their minutes
+        self.order = np.flatnonzero(valid)[np.argsort(minutes[valid], kind="stable")]
+        self.sorted_minutes = minutes[self.order]
+        self.durations = durations
+
+        # Totals per distinct minute, for unfiltered series
+        self.minutes, starts = np.unique(self.sorted_minutes, return_index=True)
+        self.minute_counts = np.diff(np.append(starts, len(self.order)))
+        self.minute_durations = np.add.reduceat(durations[self.order], starts) if len(starts) else np.zeros(0)
+
+    @classmethod
+    def from_frame(cls, df):
+        durations = df["Call Duration Seconds"] if "Call Duration Seconds" in df.columns else np.zeros(len(df))
+        return cls(df["CreatedOn"], durations)
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (
+            self.order, self.sorted_minutes, self.durations,
+            self.minutes, self.minute_counts, self.minute_durations,
+        ))
+
+    def regroup(self):
+        return self  # no Group involved
+
+    def bounds(self):
+        """ (first, last) timestamp in the data, or (None, None) if there is none """
+        if not len(self.minutes):
+            return None, None
+        return _timestamps(self.minutes[[0, -1]])
+
+    def series(self, granularity=DEFAULT_GRANULARITY, rows=None, start=None, end=None):
+        """ Calls and total duration per `granularity` bucket.
+
+        `rows` are the positions selected by the filters (None for every row);
+        `start`/`end` bound the range (end inclusive, date strings or
+        timestamps). Empty buckets between the first and last call are kept
+        as zeros, like `resample`.
+        """
+        lo, hi = _minute(start), _minute(end, end_of_day=True)
+        if rows is None:
+            first = np.searchsorted(self.minutes, lo, side="left") if lo is not None else 0
+            last = np.searchsorted(self.minutes, hi, side="right") if hi is not None else len(self.minutes)
+            minutes = self.minutes[first:last]
+            counts = self.minute_counts[first:last]
+            durations = self.minute_durations[first:last]
+        else:
+            first = np.searchsorted(self.sorted_minutes, lo, side="left") if lo is not None else 0
+            last = np.searchsorted(self.sorted_minutes, hi, side="right") if hi is not None else len(self.order)
+            in_range = self.order[first:last]
+            selected = np.zeros(len(self.durations), dtype=bool)
+            selected[rows] = True
+            keep = selected[in_range]
+            minutes = self.sorted_minutes[first:last][keep]
+            counts = np.ones(len(minutes), dtype=np.int64)
+            durations = self.durations[in_range[keep]]
+        return rollup(minutes, counts, durations, GRANULARITIES[granularity])
+
+
+def rollup(minutes, counts, durations, width):
+    """ Sum per-minute counts/durations into consecutive buckets `width` minutes wide """
+    if not len(minutes):
+        return pd.DataFrame({"CreatedOn": pd.to_datetime([]), "Call Count": [], "Duration": []})
+    offset = WEEK_OFFSET if width == GRANULARITIES["W"] else 0
+    buckets = (minutes - offset) // width
+    first = buckets.min()
+    slots = buckets - first
+    n = int(slots.max()) + 1
+    return pd.DataFrame({
+        "CreatedOn": _timestamps((first + np.arange(n)) * width + offset),
+        "Call Count": np.bincount(slots, weights=counts, minlength=n).astype(np.int64),
+        "Duration": np.bincount(slots, weights=durations, minlength=n),
+    })
+
+
+def _minute(value, end_of_day=False):
+    """ Minutes since the epoch for a range bound; a bare date as `end` covers that whole day """
+    if value is None or value == "":
+        return None
+    stamp = pd.Timestamp(value)
+    if end_of_day and stamp == stamp.normalize() and len(str(value)) <= 10:
+        stamp += pd.Timedelta(days=1) - pd.Timedelta(minutes=1)
+    return int(stamp.to_datetime64().astype("datetime64[m]").astype(np.int64))
+
+
+def _timestamps(minutes):
+    return pd.to_datetime(np.asarray(minutes, dtype=np.int64).astype("datetime64[m]"))
+
+
+def get_timeseries(token):
+    """ Call time series for a cached dataset, built on first use """
+    return registry.get_derived(token, "timeseries", CallTimeSeries.from_frame, columns=TIMESERIES_COLUMNS)